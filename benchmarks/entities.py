@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+Compara los dos pipelines de extracción de entidades.
+
+- ``modelo``: regex + ``SALLEXA_SPACY_MODEL`` completo (tok2vec, parser,
+  NER...) para ``zona_afectada`` (entidades LOC/MISC y ``BODY_PARTS``).
+- ``reglas``: regex + ``spacy.blank("es")`` con el ``entity_ruler`` de
+  ``src/terminologia.json`` (``src.nlp.parse_medical``).
+
+Para cada uno mide la latencia por mensaje de la extracción completa, sin
+caché, sobre los mensajes de síntomas y urgencias de dataset.csv y los de
+conversations.log, y la precisión de ``zona_afectada`` y ``tipo_sintoma``
+sobre ``CASOS`` (mensajes anotados a mano). También lista los mensajes del
+corpus en los que los dos pipelines dan slots distintos.
+
+Antes comprueba ``CASOS_REGEX`` (plurales y formas flexionadas que la tabla
+regex debe seguir reconociendo) y sale con código 1 si alguno falla.
+
+Uso:
+    python -m benchmarks.entities
+    python -m benchmarks.entities --min-time 2 --diffs 20
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from src import config, nlp
+from src.entities import ENGINE, _extract_entities
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (mensaje, zona_afectada esperada, texto que debe contener tipo_sintoma)
+CASOS = [
+    ("Me duele la cabeza desde ayer", "cabeza", "dolor"),
+    ("Tengo un dolor fuerte en el pecho", "pecho", "dolor"),
+    ("me duele mucho el pecho y me cuesta respirar", "pecho", "dolor"),
+    ("Tengo dolor de espalda desde hace una semana", "espalda", "dolor"),
+    ("me duele la barriga", "abdomen", "dolor"),
+    ("Tengo dolores de estómago después de comer", "estómago", "dolor"),
+    ("me duele el brazo izquierdo", "brazo", "dolor"),
+    ("me duele la pierna al andar", "pierna", "dolor"),
+    ("Tengo molestias en la rodilla", "pierna", "dolor"),
+    ("me duele la garganta al tragar", "garganta", "dolor"),
+    ("tengo la tripa revuelta y diarrea", "abdomen", "diarrea"),
+    ("Tengo fiebre desde esta mañana", None, "fiebre"),
+    ("tengo 39 de fiebre", None, "fiebre"),
+    ("Tengo tos seca desde hace 3 días", None, "tos"),
+    ("Estoy mareado y con náuseas", None, "náuseas"),
+    ("tengo mareos", None, "mareo"),
+    ("He tenido vómitos toda la noche", None, "vómito"),
+    ("No puedo respirar", None, "dificultad para respirar"),
+    ("tengo dificultad para respirar", None, "dificultad para respirar"),
+    ("Me siento muy cansado últimamente", None, "cansa"),
+    ("Tengo insomnio desde hace un mes", None, "insomnio"),
+    ("Tengo calentura y escalofríos", None, "fiebre"),
+    ("Vivo en Madrid y tengo tos", None, "tos"),
+    ("Hola, buenos días", None, None),
+    ("Quiero pedir una cita con el médico", None, None),
+    ("gracias", None, None),
+]
+
+
+# Regresiones de la tabla regex frente a la búsqueda por subcadena original:
+# (mensaje, slot, valor esperado). No necesitan spaCy.
+CASOS_REGEX = [
+    ("fiebres de 40 grados", "tipo_sintoma", "fiebre"),
+    ("tengo mareos", "tipo_sintoma", "mareo"),
+    ("llevo dos días con diarreas", "tipo_sintoma", "diarrea"),
+    ("estoy fatigado", "tipo_sintoma", "fatiga"),
+    ("me noto fatigada", "tipo_sintoma", "fatiga"),
+    ("dolores de espalda fuertes", "gravedad_percibida", "grave"),
+    ("síntomas leves", "gravedad_percibida", "leve"),
+    ("molestias graves", "gravedad_percibida", "grave"),
+    ("dolores intensos", "gravedad_percibida", "grave"),
+    ("muchos mareos", "gravedad_percibida", "grave"),
+    ("pocos síntomas", "gravedad_percibida", "leve"),
+    ("gastos de farmacia", "tipo_sintoma", None),
+]
+
+
+def regresiones():
+    """Casos de ``CASOS_REGEX`` que fallan: (mensaje, slot, esperado, obtenido)."""
+    fallos = []
+    for message, slot, esperado in CASOS_REGEX:
+        obtenido = ENGINE.extract(message.lower()).get(slot)
+        if obtenido != esperado:
+            fallos.append((message, slot, esperado, obtenido))
+    return fallos
+
+
+def load_messages():
+    """Mensajes distintos de síntomas/urgencia de dataset.csv y de usuario de conversations.log."""
+    messages = []
+    with open(os.path.join(BASE_DIR, "dataset.csv"), encoding="utf-8") as f:
+        messages += [row["message"] for row in csv.DictReader(f) if row["label"] in ("síntomas", "urgencia")]
+    log_path = os.path.join(BASE_DIR, "conversations.log")
+    if os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    messages.append(json.loads(line)["user_message"])
+                except (ValueError, KeyError):
+                    continue
+    messages += [m for m, _, _ in CASOS]
+    return list(dict.fromkeys(messages))
+
+
+def _percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(messages, min_time: float) -> dict:
+    latencias = []
+    start = time.perf_counter()
+    while True:
+        for m in messages:
+            t0 = time.perf_counter()
+            _extract_entities(m)
+            latencias.append(time.perf_counter() - t0)
+        if time.perf_counter() - start >= min_time:
+            break
+    latencias.sort()
+    return {"p50_us": _percentile(latencias, 0.50) * 1e6, "p99_us": _percentile(latencias, 0.99) * 1e6,
+            "media_us": sum(latencias) / len(latencias) * 1e6}
+
+
+def accuracy() -> dict:
+    zona = sintoma = 0
+    for message, zona_esperada, sintoma_esperado in CASOS:
+        slots = _extract_entities(message)
+        zona += slots["zona_afectada"] == zona_esperada
+        if sintoma_esperado is None:
+            sintoma += slots["tipo_sintoma"] is None
+        else:
+            sintoma += sintoma_esperado in (slots["tipo_sintoma"] or "")
+    return {"zona": zona / len(CASOS), "sintoma": sintoma / len(CASOS)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-time", type=float, default=1.0, help="segundos mínimos por pipeline")
+    parser.add_argument("--diffs", type=int, default=10, help="diferencias a mostrar")
+    args = parser.parse_args()
+
+    fallos = regresiones()
+    print(f"Regresiones regex: {len(CASOS_REGEX) - len(fallos)}/{len(CASOS_REGEX)} casos correctos")
+    for message, slot, esperado, obtenido in fallos:
+        print(f"  {message!r}: {slot} {obtenido!r}, se esperaba {esperado!r}")
+    if fallos:
+        sys.exit(1)
+
+    messages = load_messages()
+    modos = ["modelo", "reglas"]
+    if nlp.get_nlp() is None:
+        print(f"El modelo spaCy '{config.SPACY_MODEL}' no está disponible: solo se mide el pipeline de reglas",
+              file=sys.stderr)
+        modos = ["reglas"]
+    if nlp.get_medical_nlp() is None:
+        print("spaCy no está instalado: no hay pipeline de reglas", file=sys.stderr)
+        modos.remove("reglas")
+    if not modos:
+        sys.exit(1)
+
+    anterior = config.ENTITY_PIPELINE
+    resultados, salidas = {}, {}
+    try:
+        for modo in modos:
+            config.ENTITY_PIPELINE = modo
+            for m in messages[:20]:   # calentamiento
+                _extract_entities(m)
+            resultados[modo] = dict(measure(messages, args.min_time), **accuracy())
+            salidas[modo] = [_extract_entities(m) for m in messages]
+    finally:
+        config.ENTITY_PIPELINE = anterior
+
+    print(f"{len(messages)} mensajes, {len(CASOS)} casos anotados")
+    print(f"{'pipeline':<10} {'p50 µs':>10} {'p99 µs':>10} {'media µs':>10} {'zona':>7} {'síntoma':>8}")
+    for modo, r in resultados.items():
+        print(f"{modo:<10} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {r['media_us']:>10.1f} "
+              f"{r['zona']:>7.0%} {r['sintoma']:>8.0%}")
+
+    if len(salidas) == 2:
+        r = resultados
+        print(f"\nreglas/modelo: latencia media x{r['modelo']['media_us'] / r['reglas']['media_us']:.1f} más rápida")
+        diferentes = [(m, a, b) for m, a, b in zip(messages, salidas["modelo"], salidas["reglas"]) if a != b]
+        print(f"Mensajes con slots distintos: {len(diferentes)} de {len(messages)}")
+        for message, a, b in diferentes[:args.diffs]:
+            cambios = {k: (a[k], b[k]) for k in a if a[k] != b[k]}
+            print(f"  {message!r}: " + ", ".join(f"{k} {x!r} -> {y!r}" for k, (x, y) in cambios.items()))
+
+
+if __name__ == "__main__":
+    main()
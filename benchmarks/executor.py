@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Compara los tipos de executor (inline, thread, process) para el trabajo NLP
+de la API: turnos de /chat y clasificación de /predict.
+
+Uso:
+    python -m benchmarks.executor --messages 2000 --concurrency 32
+
+Lanza ``--concurrency`` tareas a la vez sobre mensajes de dataset.csv y mide
+el throughput y la latencia p50/p99 de cada executor. El resultado sirve para
+elegir SALLEXA_EXECUTOR y SALLEXA_EXECUTOR_WORKERS en cada máquina.
+
+Con ``--coalescer`` comprueba además que ``PredictCoalescer`` (GET /predict)
+agrupa una ráfaga de ``--concurrency`` peticiones simultáneas en menos lotes
+que peticiones; sale con código 1 si no.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import statistics
+import sys
+import time
+
+from src.dialogue import SistemaExperto
+from src.executor import NLPExecutor, clasificar, turno_chat
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_messages(n: int):
+    with open(os.path.join(BASE_DIR, "dataset.csv"), encoding="utf-8") as f:
+        messages = [row["message"] for row in csv.DictReader(f)]
+    return (messages * (n // len(messages) + 1))[:n]
+
+
+async def _bench(executor: NLPExecutor, tarea: str, messages, concurrency: int):
+    semaforo = asyncio.Semaphore(concurrency)
+    latencias = []
+
+    async def una(mensaje):
+        async with semaforo:
+            t0 = time.perf_counter()
+            if tarea == "chat":
+                await executor.run(turno_chat, SistemaExperto(), mensaje)
+            else:
+                await executor.run(clasificar, mensaje)
+            latencias.append(time.perf_counter() - t0)
+
+    # Calentamiento: carga de modelos en cada worker
+    await asyncio.gather(*(una(m) for m in messages[:executor.workers * 2]))
+    latencias.clear()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(una(m) for m in messages))
+    total = time.perf_counter() - t0
+    latencias.sort()
+    return {
+        "ops_s": len(messages) / total,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": latencias[int(len(latencias) * 0.99) - 1] * 1000,
+    }
+
+
+async def _rafaga(coalescer, messages):
+    return await asyncio.gather(*(coalescer.classify(m) for m in messages))
+
+
+def check_coalescer(messages) -> bool:
+    """¿Agrupa ``PredictCoalescer`` una ráfaga simultánea en menos lotes que peticiones?"""
+    from src import metrics
+    from src.api import PredictCoalescer
+
+    coalescer = PredictCoalescer(window=0.05, max_batch=len(messages))
+    antes = metrics.PREDICT_BATCH_SIZE.count()
+    labels = asyncio.run(_rafaga(coalescer, messages))
+    lotes = metrics.PREDICT_BATCH_SIZE.count() - antes
+    print(f"coalescer: {len(messages)} peticiones simultáneas en {lotes} lotes")
+    return len(labels) == len(messages) and lotes < len(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--kinds", default="inline,thread,process")
+    parser.add_argument("--coalescer", action="store_true",
+                        help="comprobar que una ráfaga de GET /predict se agrupa en lotes")
+    args = parser.parse_args()
+
+    if args.coalescer and not check_coalescer(load_messages(args.concurrency)):
+        sys.exit(1)
+
+    messages = load_messages(args.messages)
+    print(f"{'executor':<10} {'tarea':<8} {'ops/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for kind in args.kinds.split(","):
+        executor = NLPExecutor(kind=kind, workers=args.workers, timeout=60, max_pending=10 ** 9)
+        try:
+            for tarea in ("chat", "predict"):
+                r = asyncio.run(_bench(executor, tarea, messages, args.concurrency))
+                print(f"{kind:<10} {tarea:<8} {r['ops_s']:>10.1f} {r['p50_ms']:>10.2f} {r['p99_ms']:>10.2f}")
+        finally:
+            executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
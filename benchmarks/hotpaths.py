@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+"""
+Micro-benchmarks de las rutas calientes de NLP.
+
+Mide ``preprocess``, ``extract_entities``, ``SistemaExperto.clasificar_intencion``,
+``SistemaExperto.procesar_mensaje`` y ``classify_message`` sobre mensajes reales
+de dataset.csv y conversations.log, con spaCy y con el fallback sin spaCy
+(NLTK/heurístico). Para cada etapa informa de ops/s y latencia p50/p99.
+
+Las cachés (src/cache.py) se desactivan durante la medición, salvo con
+``--with-cache``, para medir el trabajo real y no los aciertos.
+
+Uso:
+    python -m benchmarks.hotpaths                    # medir y comparar con la línea base
+    python -m benchmarks.hotpaths --save-baseline    # guardar la línea base de esta máquina
+    python -m benchmarks.hotpaths --threshold 0.2    # fallar si ops/s cae más de un 20 %
+
+Sale con código 1 si alguna etapa es más lenta que la línea base por encima del
+umbral. Las líneas base dependen de la máquina: genéralas en la misma en la
+que se comparan.
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+
+from src import cache, nlp
+from src.dialogue import SistemaExperto
+from src.entities import extract_entities
+from src.predict import classify_message
+from src.preprocess import preprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BASE_DIR, "benchmarks", "baseline.json")
+
+
+def load_inputs(n: int, seed: int = 0):
+    """Mensajes de dataset.csv (muestra de ``n``) y sesiones de conversations.log."""
+    with open(os.path.join(BASE_DIR, "dataset.csv"), encoding="utf-8") as f:
+        messages = [row["message"] for row in csv.DictReader(f)]
+    random.Random(seed).shuffle(messages)
+    messages = messages[:n]
+
+    sessions = OrderedDict()
+    log_path = os.path.join(BASE_DIR, "conversations.log")
+    if os.path.exists(log_path):
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                sessions.setdefault(entry.get("session_id"), []).append(entry["user_message"])
+    messages += [m for turns in sessions.values() for m in turns]
+    return messages, list(sessions.values())
+
+
+def _replay(sessions):
+    """Una operación por turno; cada sesión del log empieza con el contexto vacío."""
+    for turns in sessions:
+        sistema = SistemaExperto()
+        for i, mensaje in enumerate(turns):
+            if i == 0:
+                yield lambda s=sistema, m=mensaje: (s.reset_contexto(), s.procesar_mensaje(m))
+            else:
+                yield lambda s=sistema, m=mensaje: s.procesar_mensaje(m)
+
+
+def stages(messages, sessions):
+    sistema = SistemaExperto()
+    return OrderedDict([
+        ("preprocess", [lambda m=m: preprocess(m) for m in messages]),
+        ("extract_entities", [lambda m=m: extract_entities(m) for m in messages]),
+        ("clasificar_intencion", [lambda m=m: sistema.clasificar_intencion(m) for m in messages]),
+        ("procesar_mensaje", list(_replay(sessions)) or
+         [lambda m=m: SistemaExperto().procesar_mensaje(m) for m in messages]),
+        ("classify_message", [lambda m=m: classify_message(m) for m in messages]),
+    ])
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(ops, min_time: float, use_cache: bool):
+    """Ejecuta las operaciones en bucle hasta ``min_time`` segundos."""
+    latencias = []
+    start = time.perf_counter()
+    while True:
+        for op in ops:
+            if not use_cache:
+                for c in cache.CACHES:
+                    c.clear()
+            t0 = time.perf_counter()
+            op()
+            latencias.append(time.perf_counter() - t0)
+        if time.perf_counter() - start >= min_time:
+            break
+    latencias.sort()
+    return {
+        "ops_s": len(latencias) / sum(latencias),
+        "p50_us": _percentile(latencias, 0.50) * 1e6,
+        "p99_us": _percentile(latencias, 0.99) * 1e6,
+        "n": len(latencias),
+    }
+
+
+def run(backends, messages, sessions, min_time, use_cache):
+    results = OrderedDict()
+    spacy_nlp = nlp.get_nlp()
+    for backend in backends:
+        if backend == "spacy":
+            if spacy_nlp is None:
+                print("spaCy o su modelo no están disponibles: se omite el backend spacy", file=sys.stderr)
+                continue
+            nlp.set_nlp(spacy_nlp)
+        else:
+            nlp.set_nlp(None)
+        for name, ops in stages(messages, sessions).items():
+            for op in ops[:20]:  # calentamiento
+                op()
+            results[f"{backend}/{name}"] = measure(ops, min_time, use_cache)
+    nlp.set_nlp(spacy_nlp)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Lista de (clave, caída relativa) de las etapas que empeoran más que ``threshold``."""
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        drop = 1.0 - r["ops_s"] / base["ops_s"]
+        r["vs_baseline"] = -drop
+        if drop > threshold:
+            regressions.append((key, drop))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300, help="mensajes de dataset.csv a usar")
+    parser.add_argument("--min-time", type=float, default=1.0, help="segundos mínimos por etapa")
+    parser.add_argument("--backends", default="spacy,fallback")
+    parser.add_argument("--with-cache", action="store_true", help="no vaciar las cachés entre operaciones")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="caída máxima de ops/s respecto a la línea base (0.25 = 25 %%)")
+    parser.add_argument("--json", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args()
+
+    messages, sessions = load_inputs(args.messages)
+    results = run(args.backends.split(","), messages, sessions, args.min_time, args.with_cache)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print("Guardada línea base en", args.baseline)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    print(f"{'etapa':<36} {'ops/s':>12} {'p50 µs':>10} {'p99 µs':>10} {'vs base':>9}")
+    for key, r in results.items():
+        vs = f"{r['vs_baseline']:+.0%}" if "vs_baseline" in r else ""
+        print(f"{key:<36} {r['ops_s']:>12.1f} {r['p50_us']:>10.1f} {r['p99_us']:>10.1f} {vs:>9}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        for key, drop in regressions:
+            print(f"REGRESIÓN: {key} es un {drop:.0%} más lento que la línea base", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
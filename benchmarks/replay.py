@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Prueba de carga reproduciendo las sesiones reales de conversations.log.
+
+Agrupa las líneas del log por ``session_id`` y reproduce cada sesión turno a
+turno contra ``POST /chat``, con varias sesiones en paralelo. Cada sesión usa
+su propio cliente HTTP, así que conserva la cookie ``session_id`` igual que un
+navegador. Por defecto la app se ejecuta en el mismo proceso (ASGI, sin red);
+con ``--url`` se ataca un uvicorn local.
+
+Uso:
+    python -m benchmarks.replay                              # ASGI en proceso
+    python -m benchmarks.replay --concurrency 64 --repeat 20
+    python -m benchmarks.replay --speedup 10                 # respeta las pausas del log, 10x más rápido
+    python -m benchmarks.replay --url http://127.0.0.1:8000
+
+Informa de throughput, latencia p50/p95/p99, tasa de errores y de los turnos
+cuya respuesta difiere de la registrada en el log (cambios de comportamiento).
+Sale con código 1 si hay errores o diferencias.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import httpx
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_sessions(path: str):
+    """Sesiones del log: lista de listas de turnos (timestamp, mensaje, respuesta)."""
+    sessions = OrderedDict()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            try:
+                ts = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            except (KeyError, ValueError):
+                ts = None
+            sessions.setdefault(entry.get("session_id"), []).append(
+                (ts, entry["user_message"], entry.get("bot_response"))
+            )
+    return list(sessions.values())
+
+
+class Resultados:
+    def __init__(self):
+        self.latencias = []
+        self.errores = OrderedDict()   # código/excepción -> número
+        self.diferencias = []          # (sesión, turno, mensaje, esperada, obtenida)
+
+    def error(self, motivo: str):
+        self.errores[motivo] = self.errores.get(motivo, 0) + 1
+
+
+async def _replay_session(client: httpx.AsyncClient, n: int, turns, speedup: float, res: Resultados):
+    anterior = None
+    for i, (ts, mensaje, esperada) in enumerate(turns):
+        if speedup > 0 and ts is not None and anterior is not None and ts > anterior:
+            await asyncio.sleep((ts - anterior) / speedup)
+        anterior = ts
+        t0 = time.perf_counter()
+        try:
+            r = await client.post("/chat", data={"message": mensaje})
+        except httpx.HTTPError as e:
+            res.error(type(e).__name__)
+            return
+        res.latencias.append(time.perf_counter() - t0)
+        if r.status_code != 200:
+            res.error(f"HTTP {r.status_code}")
+            continue
+        obtenida = r.json().get("respuesta")
+        if esperada is not None and obtenida != esperada:
+            res.diferencias.append((n, i, mensaje, esperada, obtenida))
+
+
+async def replay(sessions, transport=None, base_url="http://sallexa", concurrency=16,
+                 speedup=0.0, timeout=30.0) -> Resultados:
+    res = Resultados()
+    semaforo = asyncio.Semaphore(concurrency)
+
+    async def una(n, turns):
+        async with semaforo:
+            # Un cliente por sesión: su propio tarro de cookies
+            async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=timeout) as client:
+                await _replay_session(client, n, turns, speedup, res)
+
+    await asyncio.gather(*(una(n, turns) for n, turns in enumerate(sessions)))
+    return res
+
+
+async def _run(args, sessions):
+    if args.url:
+        return await replay(sessions, base_url=args.url, concurrency=args.concurrency, speedup=args.speedup)
+
+    # En proceso: no escribir las respuestas reproducidas en el log real
+    os.environ.setdefault("SALLEXA_LOG_FILE", os.path.join(tempfile.gettempdir(), "sallexa_replay.log"))
+    from src.api import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        return await replay(sessions, transport=transport, concurrency=args.concurrency, speedup=args.speedup)
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=os.path.join(BASE_DIR, "conversations.log"))
+    parser.add_argument("--url", help="URL de un servidor en marcha (por defecto, ASGI en proceso)")
+    parser.add_argument("--concurrency", type=int, default=16, help="sesiones reproducidas a la vez")
+    parser.add_argument("--speedup", type=float, default=0.0,
+                        help="factor de aceleración de las pausas del log (0 = sin pausas)")
+    parser.add_argument("--repeat", type=int, default=1, help="veces que se reproduce cada sesión")
+    parser.add_argument("--show", type=int, default=10, help="diferencias a mostrar")
+    args = parser.parse_args()
+
+    sessions = load_sessions(args.log)
+    n_sesiones = len(sessions)
+    sessions = sessions * args.repeat
+    if not sessions:
+        sys.exit(f"No hay sesiones en {args.log}")
+    n_turnos = sum(len(s) for s in sessions)
+
+    t0 = time.perf_counter()
+    res = asyncio.run(_run(args, sessions))
+    total = time.perf_counter() - t0
+
+    lat = sorted(res.latencias)
+    n_errores = sum(res.errores.values())
+    print(f"Sesiones: {len(sessions)}  turnos: {n_turnos}  concurrencia: {args.concurrency}  "
+          f"destino: {args.url or 'ASGI en proceso'}")
+    print(f"Throughput: {len(lat) / total:.1f} turnos/s en {total:.2f} s")
+    if lat:
+        print(f"Latencia ms: p50 {_percentile(lat, 0.50) * 1000:.2f}  p95 {_percentile(lat, 0.95) * 1000:.2f}  "
+              f"p99 {_percentile(lat, 0.99) * 1000:.2f}  max {lat[-1] * 1000:.2f}")
+    print(f"Errores: {n_errores} ({n_errores / n_turnos:.1%})" +
+          "".join(f"  {motivo}: {n}" for motivo, n in res.errores.items()))
+    print(f"Respuestas distintas del log: {len(res.diferencias)} de {n_turnos}")
+    distintas = OrderedDict()   # (mensaje, esperada, obtenida) -> (sesión, turno, veces)
+    for n, i, mensaje, esperada, obtenida in res.diferencias:
+        clave = (mensaje, esperada, obtenida)
+        primera = distintas.get(clave, (n % n_sesiones, i, 0))
+        distintas[clave] = primera[:2] + (primera[2] + 1,)
+    for (mensaje, esperada, obtenida), (n, i, veces) in list(distintas.items())[:args.show]:
+        print(f"  sesión {n} turno {i} (x{veces}): {mensaje!r}\n    log:   {esperada!r}\n    ahora: {obtenida!r}")
+
+    if n_errores or res.diferencias:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
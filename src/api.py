@@ -2,27 +2,146 @@
 FastAPI app para Sallexa v2.0: Asistente Médico Conversacional.
 Endpoints:
   - GET  / → Página de chat
+  - POST /predict/batch → Clasifica un array JSON o un cuerpo JSONL y devuelve JSONL
   - POST /chat → Procesa mensaje del usuario y devuelve respuesta del bot
+  - WS   /ws/chat → Chat por WebSocket con una sesión por conexión
+  - GET  /sessions/stats → Contadores del almacén de sesiones
+  - GET  /startup → Informe de tiempos de arranque del worker
+  - GET  /cache/stats → Aciertos/fallos de la caché de preprocesado, etiquetas y entidades
+  - GET  /metrics → Métricas en formato de texto de Prometheus
+  - GET  /model → Formato y versión del modelo de clasificación activo
+  - GET  /profiles → Perfiles recientes (SALLEXA_PROFILE=1)
   - GET  /docs → Documentación automática
 """
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+import asyncio
+import atexit
+import json
+import time
+from contextlib import asynccontextmanager
+_IMPORT_START = time.perf_counter()
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import os
 import uuid
-import json
-from datetime import datetime
+from src import cache, config, metrics, profiling
+from src.conversation_log import ConversationLogger
 from src.dialogue import SistemaExperto
+from src.executor import NLPExecutor, Saturado, clasificar, clasificar_lote, turno_chat
+from src.predict_batch import CHUNK_SIZE, classify_batch, message_from_item
+from src.sessions import create_session_store
+from src.startup import report as startup_report, warmup
+
+# Logger de conversaciones en segundo plano (cola + hilo escritor por lotes)
+conversation_logger = ConversationLogger(
+    config.LOG_FILE,
+    batch_size=config.LOG_BATCH,
+    flush_interval=config.LOG_FLUSH_INTERVAL,
+    rotate=config.LOG_ROTATE,
+    max_bytes=config.LOG_MAX_BYTES,
+    backup_count=config.LOG_BACKUPS,
+)
+atexit.register(conversation_logger.stop)
 
-app = FastAPI(title="Sallexa v2.0", description="Asistente Médico Conversacional")
+# Pool para el trabajo CPU-bound (spaCy, regex, sklearn) fuera del event loop
+executor = NLPExecutor(
+    kind=config.EXECUTOR,
+    workers=config.EXECUTOR_WORKERS,
+    timeout=config.REQUEST_TIMEOUT,
+    max_pending=config.MAX_PENDING,
+    initializer=warmup if config.WARMUP else None,
+)
+
+class PredictCoalescer:
+    """
+    Agrupa las peticiones GET /predict que llegan casi a la vez.
+
+    Si no hay ningún lote en curso, la petición se envía sin esperar. Si lo hay,
+    se acumula con las siguientes hasta que ese lote termina, como mucho
+    ``window`` segundos o hasta ``max_batch`` mensajes. Así una petición
+    aislada no añade latencia y bajo carga los mensajes se agrupan. Cada lote
+    se clasifica con una sola tarea del executor (``clasificar_lote``: un
+    ``transform`` + ``predict``) y cada petición recibe su etiqueta. Un error
+    del lote (503, 504...) se devuelve a todas sus peticiones.
+    """
 
-# Instancia global de sesiones
-sessions = {}
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._lote = []       # (mensaje, future, instante de llegada)
+        self._timer = None
+        self._tareas = set()
+        self._en_curso = 0    # lotes enviados al executor y aún sin resultado
 
-# Archivo de logs
-LOG_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "conversations.log")
+    async def classify(self, text: str) -> str:
+        fut = asyncio.get_running_loop().create_future()
+        self._lote.append((text, fut, time.perf_counter()))
+        if len(self._lote) >= self.max_batch or not self._en_curso:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        lote, self._lote = self._lote, []
+        if lote:
+            # Se cuenta ya, no al arrancar la tarea: las peticiones que llegan en
+            # este mismo ciclo del loop deben esperar a este lote, no abrir otro
+            self._en_curso += 1
+            tarea = asyncio.ensure_future(self._run(lote))
+            self._tareas.add(tarea)
+            tarea.add_done_callback(self._tareas.discard)
+
+    async def _run(self, lote):
+        ahora = time.perf_counter()
+        metrics.PREDICT_BATCH_SIZE.observe(len(lote))
+        for _, _, llegada in lote:
+            metrics.PREDICT_BATCH_WAIT.observe(ahora - llegada)
+        error = None
+        try:
+            labels, registro = await executor.run(clasificar_lote, [text for text, _, _ in lote])
+            metrics.apply(registro)
+        except Exception as e:
+            error = e
+        finally:
+            # Antes de despertar a los llamantes: su siguiente petición ve el executor libre
+            self._en_curso -= 1
+            if self._lote and not self._en_curso:
+                self._flush()
+        for i, (_, fut, _) in enumerate(lote):
+            if fut.done():        # el cliente se desconectó
+                continue
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(labels[i])
+
+# Opcional (SALLEXA_PREDICT_BATCH_WINDOW_MS > 0): agrupar GET /predict concurrentes
+predict_coalescer = PredictCoalescer(config.PREDICT_BATCH_WINDOW, config.PREDICT_BATCH_MAX) \
+    if config.PREDICT_BATCH_WINDOW > 0 else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    conversation_logger.start()
+    import_s = round(_READY - _IMPORT_START, 4)
+    if config.WARMUP:
+        await asyncio.get_running_loop().run_in_executor(None, warmup)
+    startup_report["import_api_s"] = import_s
+    print(f"Sallexa listo: {startup_report}", flush=True)
+    yield
+    executor.shutdown()
+    conversation_logger.stop()
+
+app = FastAPI(title="Sallexa v2.0", description="Asistente Médico Conversacional", lifespan=lifespan)
+
+# Sesiones acotadas (en memoria o SQLite compartido entre workers)
+sessions = create_session_store()
 
 # Templates
 template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates")
@@ -31,57 +150,147 @@ if not os.path.exists(template_dir):
 templates = Jinja2Templates(directory=template_dir)
 
 def get_or_create_session(session_id: str) -> SistemaExperto:
-    if session_id not in sessions:
-        sessions[session_id] = SistemaExperto()
-    return sessions[session_id]
-
-def log_conversation(session_id: str, user_msg: str, bot_response: str):
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "session_id": session_id,
-        "user_message": user_msg,
-        "bot_response": bot_response
-    }
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry, ensure_ascii=False) + "\n")
-
-def classify_message(message: str) -> str:
-    """Clasifica un mensaje usando el modelo guardado."""
-    # Regla simple por palabras clave para casos administrativos
-    admin_keywords = [
-        "horario", "horarios", "cita", "citas", "turno", "turnos",
-        "receta", "recetas", "renovar", "agenda", "atencion", "atención",
-        "baja", "bajas", "factura", "facturación", "pago"
-    ]
-    lower = message.lower()
-    for kw in admin_keywords:
-        if kw in lower:
-            return "administrativo"
+    return sessions.get_or_create(session_id)
 
-    if clf is None or vectorizer is None:
-        return "error"
+async def session_io(func, *args):
+    """
+    Lectura/escritura del almacén de sesiones fuera del event loop (con SQLite
+    hay consulta y commit). Va al pool por defecto del loop, no al executor NLP:
+    con SALLEXA_EXECUTOR=process sus tareas no ven el almacén de este proceso.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+def busy_error(exc: Exception) -> tuple:
+    """Mensaje y código HTTP para peticiones rechazadas por contrapresión o timeout."""
+    if isinstance(exc, Saturado):
+        return "Servidor ocupado, inténtalo de nuevo", 503
+    return "Tiempo de procesamiento agotado", 504
+
+def busy_response(exc: Exception) -> JSONResponse:
+    error, status_code = busy_error(exc)
+    return JSONResponse({"error": error}, status_code=status_code)
+
+def log_conversation(session_id: str, user_msg: str, bot_response: str, estado: str = None):
+    with metrics.stage("log"):
+        if estado is None:
+            conversation_logger.log(session_id, user_msg, bot_response)
+        else:
+            conversation_logger.log(session_id, user_msg, bot_response, estado=estado)
+
+async def run_profiled(endpoint: str, func, *args, key=None, **meta):
+    """
+    Ejecuta la tarea en el executor con cProfile (ver ``src.profiling``) y
+    guarda el perfil, salvo si ya había otro activo. Devuelve el resultado de la tarea.
+    """
+    result, stats, segundos = await executor.run(profiling.run_profiled, func, *args, key=key)
+    if stats is None:
+        return result
+    if func is turno_chat:
+        meta["estado_despues"] = result[1].contexto_paciente["estado_actual"].name
+    await asyncio.get_running_loop().run_in_executor(
+        None, lambda: profiling.save(stats, segundos, endpoint=endpoint, **meta))
+    return result
 
-    clean = preprocess(message)
-    X_new = vectorizer.transform([clean])
-    prediction = clf.predict(X_new)
-    return prediction[0]
+def observe_request(endpoint: str, response, t0: float):
+    """Duración y código HTTP de una petición en las métricas."""
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint)
+    metrics.REQUESTS.inc(endpoint, str(response.status_code))
+    return response
 
 # ENDPOINT 1: GET /predict?text=... (legacy)
 @app.get("/predict", response_class=JSONResponse)
-async def predict(text: str):
+async def predict(text: str, request: Request):
     """
     Endpoint JSON para predicción rápida (legacy).
     Uso: GET /predict?text=Me%20duele%20la%20cabeza
     Respuesta: {"label": "síntomas"}
     """
+    t0 = time.perf_counter()
     if not text or not text.strip():
-        return JSONResponse({"error": "Parámetro 'text' vacío"}, status_code=400)
+        return observe_request("/predict", JSONResponse({"error": "Parámetro 'text' vacío"}, status_code=400), t0)
     
     try:
-        label = classify_message(text)
-        return JSONResponse({"label": label, "message": text})
+        with metrics.stage("turno"):
+            if config.PROFILE and profiling.wanted(request.headers.get(profiling.HEADER)):
+                label, registro = await run_profiled("/predict", clasificar, text, **profiling.message_meta(text))
+                metrics.apply(registro)
+            elif predict_coalescer is not None:
+                label = await predict_coalescer.classify(text)
+            else:
+                label, registro = await executor.run(clasificar, text)
+                metrics.apply(registro)
+        response = JSONResponse({"label": label, "message": text})
+    except (Saturado, asyncio.TimeoutError) as e:
+        response = busy_response(e)
     except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=500)
+        response = JSONResponse({"error": str(e)}, status_code=500)
+    return observe_request("/predict", response, t0)
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que puede leer el cuerpo de la petición mientras responde.
+    No escucha la desconexión del cliente en paralelo, porque esa escucha
+    consumiría los mensajes del cuerpo que aún no se han leído.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+async def _iter_batch_messages(request: Request):
+    """Mensajes de un array JSON, o de un cuerpo JSONL leído en streaming."""
+    if request.headers.get("content-type", "").startswith("application/json"):
+        items = await request.json()
+        if not isinstance(items, list):
+            raise ValueError("Se esperaba un array JSON")
+        for item in items:
+            yield message_from_item(item)
+        return
+
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield message_from_item(json.loads(line))
+    if buffer.strip():
+        yield message_from_item(json.loads(buffer))
+
+# ENDPOINT 1b: POST /predict/batch - Clasificación por lotes
+@app.post("/predict/batch")
+async def predict_batch(request: Request):
+    """
+    Clasifica muchos mensajes en una sola petición.
+    Cuerpo: array JSON (application/json) o JSONL (application/x-ndjson),
+    con cadenas u objetos {"message": ...}.
+    Respuesta: JSONL en streaming, una línea {"label", "message"} por mensaje.
+    Cada bloque de mensajes se vectoriza y predice con una sola llamada.
+    """
+    async def generate():
+        chunk = []
+        try:
+            async for message in _iter_batch_messages(request):
+                chunk.append(message)
+                if len(chunk) >= CHUNK_SIZE:
+                    for line in await _classify_chunk(chunk):
+                        yield line
+                    chunk = []
+            if chunk:
+                for line in await _classify_chunk(chunk):
+                    yield line
+        except (Saturado, asyncio.TimeoutError) as e:
+            yield json.dumps({"error": busy_error(e)[0]}, ensure_ascii=False) + "\n"
+        except ValueError as e:
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson")
+
+async def _classify_chunk(chunk):
+    labels = await executor.run(classify_batch, chunk)
+    return [
+        json.dumps({"label": label, "message": message}, ensure_ascii=False) + "\n"
+        for message, label in zip(chunk, labels)
+    ]
 
 # ENDPOINT 2: GET / - Mostrar chat
 @app.get("/", response_class=HTMLResponse)
@@ -96,32 +305,51 @@ async def chat(request: Request):
     Procesa un mensaje del usuario y devuelve la respuesta del bot.
     Maneja sesiones por cookie.
     """
+    t0 = time.perf_counter()
+    return observe_request("/chat", await _chat(request), t0)
+
+async def _chat(request: Request):
     try:
         # Obtener session_id de cookie, o generar nueva
         session_id = request.cookies.get("session_id")
         if not session_id:
             session_id = str(uuid.uuid4())
         
-        form = await request.form()
+        with metrics.stage("form"):
+            form = await request.form()
         message = form.get("message", "").strip()
         
         if not message:
             return JSONResponse({"error": "Mensaje vacío"}, status_code=400)
         
-        # Obtener o crear sesión
-        sistema = get_or_create_session(session_id)
-        
-        # Procesar mensaje
-        respuesta = sistema.procesar_mensaje(message)
+        # Procesar mensaje en el pool, en orden dentro de la sesión
+        try:
+            async with executor.ordered(session_id):
+                with metrics.stage("sesion"):
+                    sistema = await session_io(get_or_create_session, session_id)
+                estado = sistema.contexto_paciente["estado_actual"].name
+                metrics.FSM_MESSAGES.inc(estado)
+                with metrics.stage("turno"):
+                    if config.PROFILE and profiling.wanted(request.headers.get(profiling.HEADER)):
+                        respuesta, sistema, registro = await run_profiled(
+                            "/chat", turno_chat, sistema, message, key=session_id,
+                            session_id=session_id, estado_antes=estado, **profiling.message_meta(message))
+                    else:
+                        respuesta, sistema, registro = await executor.run(turno_chat, sistema, message, key=session_id)
+                metrics.apply(registro)
+                with metrics.stage("sesion"):
+                    await session_io(sessions.save, session_id, sistema)
+        except (Saturado, asyncio.TimeoutError) as e:
+            return busy_response(e)
         
         # Loggear conversación
-        log_conversation(session_id, message, respuesta)
+        log_conversation(session_id, message, respuesta, sistema.contexto_paciente["estado_actual"].name)
         
         # Preparar respuesta
         response_data = {
             "respuesta": respuesta,
             "estado": sistema.contexto_paciente["estado_actual"].name,
-            "slots": sistema.contexto_paciente["slots"]
+            "slots": dict(sistema.contexto_paciente["slots"])
         }
         
         # Crear respuesta con cookie
@@ -132,6 +360,100 @@ async def chat(request: Request):
     except Exception as e:
         return JSONResponse({"error": str(e)}, status_code=500)
 
+# ENDPOINT 3b: WS /ws/chat - Chat por WebSocket
+ws_conexiones = 0
+
+@app.websocket("/ws/chat")
+async def ws_chat(websocket: WebSocket):
+    """
+    Chat por WebSocket. La conexión tiene su propio SistemaExperto, sin
+    cookie ni almacén de sesiones; al cerrarse, la sesión se libera.
+    Tramas JSON del cliente:
+      {"message": "..."}  → {"type": "respuesta", "respuesta", "estado", "slots"}
+      {"type": "reset"}   → {"type": "reset"}
+      {"type": "ping"}    → {"type": "pong"}
+    El servidor envía {"type": "ping"} tras SALLEXA_WS_PING_INTERVAL segundos
+    sin tráfico y cierra la conexión si el cliente no responde a
+    SALLEXA_WS_MAX_MISSED_PINGS pings seguidos.
+    """
+    global ws_conexiones
+    await websocket.accept()
+    ws_conexiones += 1
+    session_id = str(uuid.uuid4())
+    sistema = SistemaExperto()
+    sin_respuesta = 0
+    # La cabecera de la conexión perfila todos sus mensajes; sin ella, muestreo por mensaje
+    perfilar_conexion = config.PROFILE and profiling.requested(websocket.headers.get(profiling.HEADER))
+    try:
+        while True:
+            try:
+                frame = await asyncio.wait_for(websocket.receive_json(), config.WS_PING_INTERVAL)
+            except asyncio.TimeoutError:
+                if sin_respuesta >= config.WS_MAX_MISSED_PINGS:
+                    await websocket.close(code=1001)
+                    return
+                sin_respuesta += 1
+                await websocket.send_json({"type": "ping"})
+                continue
+            except ValueError:
+                await websocket.send_json({"type": "error", "error": "Trama JSON no válida"})
+                continue
+            except KeyError:      # trama binaria: receive_json solo lee tramas de texto
+                await websocket.send_json({"type": "error", "error": "Solo se admiten tramas de texto JSON"})
+                continue
+            sin_respuesta = 0
+
+            tipo = frame.get("type") if isinstance(frame, dict) else None
+            if tipo == "pong":
+                continue
+            if tipo == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            if tipo == "reset":
+                sistema = SistemaExperto()
+                await websocket.send_json({"type": "reset"})
+                continue
+
+            t0 = time.perf_counter()
+            message = frame.get("message", "") if isinstance(frame, dict) else ""
+            message = message.strip() if isinstance(message, str) else ""
+            if not message:
+                metrics.REQUESTS.inc("/ws/chat", "400")
+                await websocket.send_json({"type": "error", "error": "Mensaje vacío"})
+                continue
+
+            try:
+                async with executor.ordered(session_id):
+                    estado = sistema.contexto_paciente["estado_actual"].name
+                    metrics.FSM_MESSAGES.inc(estado)
+                    with metrics.stage("turno"):
+                        if config.PROFILE and (perfilar_conexion or profiling.wanted()):
+                            respuesta, sistema, registro = await run_profiled(
+                                "/ws/chat", turno_chat, sistema, message, key=session_id,
+                                session_id=session_id, estado_antes=estado, **profiling.message_meta(message))
+                        else:
+                            respuesta, sistema, registro = await executor.run(turno_chat, sistema, message, key=session_id)
+                    metrics.apply(registro)
+            except (Saturado, asyncio.TimeoutError) as e:
+                error, status_code = busy_error(e)
+                metrics.REQUESTS.inc("/ws/chat", str(status_code))
+                await websocket.send_json({"type": "error", "error": error})
+                continue
+
+            log_conversation(session_id, message, respuesta, sistema.contexto_paciente["estado_actual"].name)
+            await websocket.send_json({
+                "type": "respuesta",
+                "respuesta": respuesta,
+                "estado": sistema.contexto_paciente["estado_actual"].name,
+                "slots": dict(sistema.contexto_paciente["slots"]),
+            })
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, "/ws/chat")
+            metrics.REQUESTS.inc("/ws/chat", "200")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ws_conexiones -= 1
+
 # ENDPOINT 4: POST /classify (legacy)
 @app.post("/classify", response_class=HTMLResponse)
 async def classify(request: Request):
@@ -145,8 +467,9 @@ async def classify(request: Request):
         if not message:
             return f"<div data-classification='error'>Error: Mensaje vacío</div>"
         
-        # Usar el sistema nuevo
-        respuesta = sistema.procesar_mensaje(message)
+        # Usar el sistema nuevo, en una sesión desechable: no toca la conversación de /chat
+        respuesta, _, registro = await executor.run(turno_chat, SistemaExperto(), message)
+        metrics.apply(registro)
         return f"<div data-respuesta='{respuesta}'></div>"
     except Exception as e:
         return f"<div data-respuesta='Error: {str(e)}'></div>"
@@ -156,13 +479,86 @@ async def classify(request: Request):
 async def reset(request: Request):
     """Resetea el contexto de la conversación."""
     session_id = request.cookies.get("session_id")
-    if session_id and session_id in sessions:
-        del sessions[session_id]
+    if session_id:
+        await session_io(sessions.delete, session_id)
     return JSONResponse({"message": "Conversación reseteada"})
 
+# ENDPOINT 6: GET /sessions/stats - Contadores del almacén de sesiones
+@app.get("/sessions/stats", response_class=JSONResponse)
+async def sessions_stats():
+    """Sesiones residentes, creadas, expulsadas por LRU y caducadas por TTL."""
+    return JSONResponse(sessions.stats())
+
+# ENDPOINT 8: GET /startup - Informe de arranque del worker
+@app.get("/startup", response_class=JSONResponse)
+async def startup_stats():
+    """Tiempos de importación, carga de modelos y primer mensaje de este worker."""
+    return JSONResponse(startup_report)
+
+# ENDPOINT 7: GET /cache/stats - Aciertos y fallos de caché
+@app.get("/cache/stats", response_class=JSONResponse)
+async def cache_stats():
+    """Tamaño, aciertos y fallos de las cachés (por proceso)."""
+    return JSONResponse(cache.stats())
+
+# ENDPOINT 10: GET /model - Modelo de clasificación activo
+@app.get("/model", response_class=JSONResponse)
+async def model_info():
+    """Formato ("online", "npy" o "pickle") y versión del modelo online (cambia en caliente)."""
+    from src.predict import model_kind, model_version
+    return JSONResponse({"tipo": model_kind(), "version": model_version()})
+
+# ENDPOINT 11: GET /profiles - Perfiles recientes
+@app.get("/profiles", response_class=JSONResponse)
+async def profiles(limit: int = 20):
+    """Metadatos de los perfiles más recientes (SALLEXA_PROFILE=1), el más nuevo primero."""
+    return JSONResponse({"activo": config.PROFILE, "muestreo": config.PROFILE_SAMPLE_RATE,
+                         "perfiles": profiling.recent(limit)})
+
+@app.get("/profiles/{profile_id}")
+async def profile_file(profile_id: str):
+    """Descarga el ``.prof`` de un perfil (``python -m pstats fichero.prof``)."""
+    path = profiling.prof_path(profile_id)
+    if path is None:
+        return JSONResponse({"error": "Perfil no encontrado"}, status_code=404)
+    return FileResponse(path, media_type="application/octet-stream", filename=profile_id + ".prof")
+
+# ENDPOINT 9: GET /metrics - Métricas Prometheus
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Histogramas por etapa, contadores de la FSM, cachés, sesiones y executor (por proceso)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@metrics.register_collector
+def _collect_stats():
+    caches = cache.stats()
+    sesiones = sessions.stats()
+    pool = executor.stats()
+    log = conversation_logger.stats()
+    return [
+        ("sallexa_cache_hits_total", "counter", "Aciertos de caché",
+         [({"cache": n}, s["hits"]) for n, s in caches.items()]),
+        ("sallexa_cache_misses_total", "counter", "Fallos de caché",
+         [({"cache": n}, s["misses"]) for n, s in caches.items()]),
+        ("sallexa_cache_entries", "gauge", "Entradas en caché",
+         [({"cache": n}, s["size"]) for n, s in caches.items()]),
+        ("sallexa_sessions", "gauge", "Sesiones residentes", [({}, sesiones["residentes"])]),
+        ("sallexa_sessions_total", "counter", "Sesiones creadas y eliminadas por motivo",
+         [({"evento": k}, sesiones[k]) for k in ("creadas", "expulsadas_lru", "caducadas_ttl")]),
+        ("sallexa_ws_connections", "gauge", "Conexiones WebSocket abiertas", [({}, ws_conexiones)]),
+        ("sallexa_executor_in_flight", "gauge", "Tareas NLP en vuelo", [({}, pool["en_vuelo"])]),
+        ("sallexa_executor_rejected_total", "counter", "Tareas rechazadas o con timeout",
+         [({"motivo": "saturado"}, pool["rechazadas"]), ({"motivo": "timeout"}, pool["timeouts"])]),
+        ("sallexa_log_pending", "gauge", "Entradas de log pendientes de escribir", [({}, log["pendientes"])]),
+        ("sallexa_log_entries_total", "counter", "Entradas de log escritas y descartadas",
+         [({"resultado": "escritas"}, log["escritas"]), ({"resultado": "descartadas"}, log["descartadas"])]),
+    ]
+
 # ENDPOINT 4: GET /docs - Documentación automática (Swagger UI)
 # (FastAPI lo genera automáticamente)
 
+_READY = time.perf_counter()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8000)
@@ -0,0 +1,73 @@
+"""
+Caché LRU compartida para el trabajo NLP repetido.
+
+El tráfico es muy repetitivo ("hola", "gracias", "me duele la cabeza"...), así
+que el texto preprocesado, la etiqueta predicha y los slots extraídos se
+guardan por texto normalizado. La clave de ``LABEL_CACHE`` incluye la
+generación del modelo (``src.predict.label_key``) y la caché se vacía al
+cargar un modelo nuevo (``src.predict.load_model``).
+"""
+
+import threading
+from collections import OrderedDict
+from src import config
+
+_MISS = object()
+
+
+def normalize_key(text: str) -> str:
+    """Clave de caché: espacios colapsados y sin espacios en los extremos."""
+    return " ".join(str(text).split())
+
+
+class LRUCache:
+    """Diccionario acotado con expulsión LRU y contadores de aciertos/fallos."""
+
+    def __init__(self, maxsize: int, name: str = ""):
+        self.maxsize = maxsize
+        self.name = name
+        self._data: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISS)
+            if value is _MISS:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+PREPROCESS_CACHE = LRUCache(config.CACHE_SIZE, "preprocess")
+LABEL_CACHE = LRUCache(config.CACHE_SIZE, "label")
+ENTITY_CACHE = LRUCache(config.CACHE_SIZE, "entities")
+
+CACHES = (PREPROCESS_CACHE, LABEL_CACHE, ENTITY_CACHE)
+
+
+def stats() -> dict:
+    return {cache.name: cache.stats() for cache in CACHES}
@@ -0,0 +1,78 @@
+"""
+Configuración de Sallexa leída de variables de entorno.
+Cada valor tiene un valor por defecto razonable para desarrollo local.
+"""
+
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# Modelos (rutas relativas al repositorio por defecto)
+SPACY_MODEL = os.environ.get("SALLEXA_SPACY_MODEL", "es_core_news_sm")  # vacío = sin spaCy
+MODEL_PATH = os.environ.get("SALLEXA_MODEL_PATH", os.path.join(BASE_DIR, "sallexa_model.pkl"))
+VECTORIZER_PATH = os.environ.get("SALLEXA_VECTORIZER_PATH", os.path.join(BASE_DIR, "vectorizer.pkl"))
+SERVING_PATH = os.environ.get("SALLEXA_SERVING_PATH", os.path.join(BASE_DIR, "serving"))
+SERVING_FORMAT = os.environ.get("SALLEXA_SERVING_FORMAT", "auto")  # auto | online | npy | pickle
+ONLINE_PATH = os.environ.get("SALLEXA_ONLINE_PATH", os.path.join(BASE_DIR, "models", "online"))
+STREAMING_PATH = os.environ.get("SALLEXA_STREAMING_PATH", os.path.join(BASE_DIR, "models", "streaming"))  # train --stream sin --publish
+MODEL_CHECK_INTERVAL = _float("SALLEXA_MODEL_CHECK_INTERVAL", 5.0)  # segundos entre comprobaciones de LATEST
+WARMUP = os.environ.get("SALLEXA_WARMUP", "1") not in ("0", "false", "no", "")
+
+# Extracción de entidades: "reglas" (pipeline spaCy ligero + terminología) o "modelo" (NER de SPACY_MODEL)
+ENTITY_PIPELINE = os.environ.get("SALLEXA_ENTITY_PIPELINE", "reglas")
+TERMINOLOGIA_PATH = os.environ.get("SALLEXA_TERMINOLOGIA", os.path.join(BASE_DIR, "src", "terminologia.json"))
+
+# Reglas de decisión de razonar (src/reglas.py)
+REGLAS_PATH = os.environ.get("SALLEXA_REGLAS", os.path.join(BASE_DIR, "src", "reglas.json"))
+
+# Sesiones de diálogo
+SESSION_MAX = _int("SALLEXA_SESSION_MAX", 10000)          # sesiones residentes por worker
+SESSION_TTL = _float("SALLEXA_SESSION_TTL", 30 * 60)     # segundos de inactividad
+SESSION_BACKEND = os.environ.get("SALLEXA_SESSION_BACKEND", "memory")  # memory | sqlite
+SESSION_DB = os.environ.get("SALLEXA_SESSION_DB", os.path.join(BASE_DIR, "sessions.db"))
+
+# Chat por WebSocket (/ws/chat)
+WS_PING_INTERVAL = _float("SALLEXA_WS_PING_INTERVAL", 20.0)  # segundos sin tráfico antes de un ping
+WS_MAX_MISSED_PINGS = _int("SALLEXA_WS_MAX_MISSED_PINGS", 2)  # pings sin respuesta antes de cerrar
+
+# Registro de conversaciones
+LOG_FILE = os.environ.get("SALLEXA_LOG_FILE", os.path.join(BASE_DIR, "conversations.log"))
+LOG_BATCH = _int("SALLEXA_LOG_BATCH", 100)                       # entradas por escritura
+LOG_FLUSH_INTERVAL = _float("SALLEXA_LOG_FLUSH_INTERVAL", 1.0)   # segundos
+LOG_ROTATE = os.environ.get("SALLEXA_LOG_ROTATE", "size")        # size | daily | none
+LOG_MAX_BYTES = _int("SALLEXA_LOG_MAX_BYTES", 10 * 1024 * 1024)
+LOG_BACKUPS = _int("SALLEXA_LOG_BACKUPS", 5)
+
+# Ejecución del trabajo NLP fuera del event loop
+EXECUTOR = os.environ.get("SALLEXA_EXECUTOR", "thread")          # thread | process | inline
+EXECUTOR_WORKERS = _int("SALLEXA_EXECUTOR_WORKERS", os.cpu_count() or 1)
+REQUEST_TIMEOUT = _float("SALLEXA_REQUEST_TIMEOUT", 10.0)        # segundos por petición
+MAX_PENDING = _int("SALLEXA_MAX_PENDING", 256)                   # tareas en vuelo antes de 503
+
+# Agrupación de peticiones GET /predict concurrentes en una sola llamada al modelo
+PREDICT_BATCH_WINDOW = _float("SALLEXA_PREDICT_BATCH_WINDOW_MS", 0.0) / 1000  # espera máxima; 0 = desactivado
+PREDICT_BATCH_MAX = _int("SALLEXA_PREDICT_BATCH_MAX", 64)                     # mensajes por lote
+
+# Perfilado bajo demanda (src/profiling.py)
+PROFILE = os.environ.get("SALLEXA_PROFILE", "0") not in ("0", "false", "no", "")
+PROFILE_SAMPLE_RATE = _float("SALLEXA_PROFILE_SAMPLE_RATE", 0.0)   # fracción de peticiones sin cabecera
+PROFILE_DIR = os.environ.get("SALLEXA_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_KEEP = _int("SALLEXA_PROFILE_KEEP", 200)                    # perfiles conservados
+
+# Caché de preprocesado, etiquetas y entidades (entradas por caché; 0 desactiva)
+CACHE_SIZE = _int("SALLEXA_CACHE_SIZE", 4096)
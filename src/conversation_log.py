@@ -0,0 +1,134 @@
+"""
+Registro de conversaciones en segundo plano.
+
+``ConversationLogger.log`` solo encola la entrada: un hilo escritor la saca de
+la cola y escribe en ``conversations.log`` (JSON por línea) por lotes, cuando
+se acumulan ``batch_size`` entradas o pasan ``flush_interval`` segundos.
+El fichero rota por tamaño (``conversations.log.1``, ``.2``...) o por día
+(``conversations.log.AAAA-MM-DD``). ``stop`` vacía la cola antes de salir.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+
+_PARAR = object()
+
+
+class ConversationLogger:
+    def __init__(self, path: str, batch_size: int = 100, flush_interval: float = 1.0,
+                 rotate: str = "size", max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                 max_queue: int = 100000):
+        if rotate not in ("size", "daily", "none"):
+            raise ValueError(f"Rotación desconocida: {rotate}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._dia = None
+        self.escritas = 0
+        self.descartadas = 0
+        self.lotes = 0
+
+    # ---- API del camino caliente ----
+    def log(self, session_id: str, user_msg: str, bot_response: str, **extra):
+        """Encola una entrada. Nunca bloquea: si la cola está llena se descarta."""
+        if self._thread is None:
+            self.start()
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "session_id": session_id,
+            "user_message": user_msg,
+            "bot_response": bot_response,
+        }
+        entry.update(extra)
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.descartadas += 1
+
+    # ---- Ciclo de vida ----
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_PARAR)
+            thread.join(timeout)
+
+    # ---- Hilo escritor ----
+    def _run(self):
+        lote = []
+        limite = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, limite - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _PARAR:
+                self._write(lote)
+                return
+            if item is not None:
+                lote.append(item)
+            if len(lote) >= self.batch_size or time.monotonic() >= limite:
+                self._write(lote)
+                lote = []
+                limite = time.monotonic() + self.flush_interval
+
+    def _write(self, lote):
+        if not lote:
+            return
+        data = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in lote).encode("utf-8")
+        try:
+            self._maybe_rotate(len(data))
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self.escritas += len(lote)
+            self.lotes += 1
+        except OSError:
+            self.descartadas += len(lote)
+
+    def _maybe_rotate(self, incoming: int):
+        if self.rotate == "size":
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                return
+            if size and size + incoming > self.max_bytes:
+                for i in range(self.backup_count - 1, 0, -1):
+                    src = f"{self.path}.{i}"
+                    if os.path.exists(src):
+                        os.replace(src, f"{self.path}.{i + 1}")
+                if self.backup_count > 0:
+                    os.replace(self.path, f"{self.path}.1")
+                else:
+                    os.remove(self.path)
+        elif self.rotate == "daily":
+            hoy = date.today()
+            if self._dia is None and os.path.exists(self.path):
+                self._dia = date.fromtimestamp(os.path.getmtime(self.path))
+            if self._dia is not None and self._dia != hoy and os.path.exists(self.path):
+                os.replace(self.path, f"{self.path}.{self._dia.isoformat()}")
+            self._dia = hoy
+
+    def stats(self) -> dict:
+        return {
+            "pendientes": self._queue.qsize(),
+            "escritas": self.escritas,
+            "lotes": self.lotes,
+            "descartadas": self.descartadas,
+        }
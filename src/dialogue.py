@@ -1,108 +1,175 @@
-from enum import Enum
+from enum import IntEnum
 from typing import Dict, Any
+from src import metrics
 from src.entities import extract_entities
+from src.keywords import INTENCIONES, INTENCIONES_PRIORIDAD
+from src.reglas import MOTOR
 
-class Estado(Enum):
+class Estado(IntEnum):
     IDLE = 0
     RECABANDO_DATOS = 1
     URGENCIA = 2
     RECOMENDACIONES = 3
     FINALIZAR = 4
 
+SLOT_NAMES = ("tipo_sintoma", "duracion", "temperatura", "gravedad_percibida", "zona_afectada")
+
+
+class Slots:
+    """
+    Slots de una sesión en un registro con ``__slots__`` (sin ``__dict__`` por
+    sesión). Se usa como un diccionario: ``slots["duracion"]``, ``get``,
+    ``items``, ``update`` y ``dict(slots)``.
+    """
+    __slots__ = SLOT_NAMES
+    _NOMBRES = frozenset(SLOT_NAMES)
+
+    def __init__(self):
+        for nombre in SLOT_NAMES:
+            setattr(self, nombre, None)
+
+    def __getitem__(self, key):
+        if key not in self._NOMBRES:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._NOMBRES:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._NOMBRES else default
+
+    def keys(self):
+        return SLOT_NAMES
+
+    def __iter__(self):
+        return iter(SLOT_NAMES)
+
+    def __len__(self):
+        return len(SLOT_NAMES)
+
+    def values(self):
+        return [getattr(self, nombre) for nombre in SLOT_NAMES]
+
+    def items(self):
+        return [(nombre, getattr(self, nombre)) for nombre in SLOT_NAMES]
+
+    def update(self, valores):
+        for key, value in dict(valores).items():
+            self[key] = value
+
+
+class Contexto:
+    """Contexto del paciente: estado de la FSM, intención y slots. Acceso como diccionario."""
+    __slots__ = ("estado_actual", "intencion_actual", "slots")
+    _NOMBRES = frozenset(__slots__)
+
+    def __init__(self):
+        self.estado_actual = Estado.IDLE
+        self.intencion_actual = None
+        self.slots = Slots()
+
+    def __getitem__(self, key):
+        if key not in self._NOMBRES:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._NOMBRES:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+
 class SistemaExperto:
+    __slots__ = ("contexto_paciente", "_reglas")
+
     def __init__(self):
-        self.contexto_paciente: Dict[str, Any] = {
-            "estado_actual": Estado.IDLE,
-            "intencion_actual": None,
-            "slots": {
-                "tipo_sintoma": None,
-                "duracion": None,
-                "temperatura": None,
-                "gravedad_percibida": None,
-                "zona_afectada": None
-            }
-        }
+        self._reglas = None   # estado de la última evaluación de MOTOR (solo caché)
+        self.contexto_paciente = Contexto()
 
     def reset_contexto(self):
-        self.contexto_paciente = {
-            "estado_actual": Estado.IDLE,
-            "intencion_actual": None,
-            "slots": {
-                "tipo_sintoma": None,
-                "duracion": None,
-                "temperatura": None,
-                "gravedad_percibida": None,
-                "zona_afectada": None
-            }
+        self._reglas = None
+        self.contexto_paciente = Contexto()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Contexto serializable (JSON) para compartir la sesión entre procesos."""
+        return {
+            "estado_actual": int(self.contexto_paciente["estado_actual"]),
+            "intencion_actual": self.contexto_paciente["intencion_actual"],
+            "slots": dict(self.contexto_paciente["slots"]),
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SistemaExperto":
+        """Reconstruye un sistema a partir de ``to_dict``."""
+        sistema = cls()
+        sistema.contexto_paciente["estado_actual"] = Estado(data["estado_actual"])
+        sistema.contexto_paciente["intencion_actual"] = data.get("intencion_actual")
+        sistema.contexto_paciente["slots"].update(data.get("slots", {}))
+        return sistema
+
     def clasificar_intencion(self, mensaje: str) -> str:
-        """Clasifica la intención del mensaje usando reglas simples."""
-        msg_lower = mensaje.lower()
-
-        # Palabras clave para urgencia
-        urgencia_keywords = [
-            "emergencia", "urgente", "grave", "muerte", "morir", "muriendo", "infarto", "accidente",
-            "sangre", "desmayo", "convulsiones", "dificultad para respirar"
-        ]
-        if any(kw in msg_lower for kw in urgencia_keywords):
-            return "urgencia"
-
-        # Palabras clave para síntomas
-        sintoma_keywords = [
-            "dolor", "duele", "duelen", "fiebre", "tos", "náuseas", "mareo", "vómito", "diarrea",
-            "cansancio", "fatiga", "insomnio", "dolor de cabeza", "dolor de estómago"
-        ]
-        if any(kw in msg_lower for kw in sintoma_keywords):
-            return "síntomas"
-
-        # Palabras clave para administrativo
-        admin_keywords = [
-            "cita", "horario", "turno", "receta", "factura", "pago", "renovar"
-        ]
-        if any(kw in msg_lower for kw in admin_keywords):
-            return "administrativo"
-
-        # Saludos
-        saludo_keywords = ["hola", "buenas", "buenos días", "buenas tardes", "buenas noches", "hey", "hi"]
-        if any(kw in msg_lower for kw in saludo_keywords):
-            return "saludo"
-
-        return "ruido"
+        """
+        Clasifica la intención del mensaje usando reglas simples.
+        Las palabras clave se buscan en una sola pasada (ver src/keywords.py)
+        y gana la categoría de mayor prioridad.
+        """
+        with metrics.stage("intencion"):
+            categorias = INTENCIONES.match(mensaje)
+        for intencion in INTENCIONES_PRIORIDAD:
+            if intencion in categorias:
+                break
+        else:
+            intencion = "ruido"
+
+        metrics.event(metrics.INTENCIONES, intencion)
+        return intencion
+
+    def slots_pedidos(self) -> set:
+        """Slots por los que acaba de preguntar el bot en el estado actual."""
+        if self.contexto_paciente["estado_actual"] != Estado.RECABANDO_DATOS:
+            return set()
+        slots = self.contexto_paciente["slots"]
+        if "fiebre" in (slots["tipo_sintoma"] or "") and not slots["temperatura"]:
+            return {"temperatura"}   # "¿Cuál es tu temperatura?"
+        return {"duracion"}          # "¿Desde cuándo...?" / "¿cuánto tiempo hace...?"
 
     def actualizar_slots(self, mensaje: str):
-        """Actualiza los slots del contexto con entidades extraídas."""
-        entidades = extract_entities(mensaje)
+        """
+        Actualiza los slots del contexto con entidades extraídas.
+        Solo se extraen los slots pedidos por el bot o aún vacíos; si el
+        mensaje describe síntomas o una urgencia (texto libre), se extraen todos.
+        """
+        slots = self.contexto_paciente["slots"]
+        if INTENCIONES.match(mensaje) & {"síntomas", "urgencia"}:
+            buscados = None
+        else:
+            buscados = self.slots_pedidos() | {k for k, v in slots.items() if v is None}
+        metrics.event(metrics.EXTRACCIONES, "completa" if buscados is None or len(buscados) == len(slots) else "parcial")
+        entidades = extract_entities(mensaje, slots=buscados)
         for key, value in entidades.items():
             if value is not None:
                 self.contexto_paciente["slots"][key] = value
 
     def razonar(self) -> str:
-        """Motor de inferencia basado en reglas IF-THEN."""
-        slots = self.contexto_paciente["slots"]
-
-        # Reglas de urgencia
-        if slots["temperatura"] and slots["temperatura"] >= 39:
-            return "URGENCIA_ALTA"
-        if slots["zona_afectada"] == "pecho" and "dolor" in (slots["tipo_sintoma"] or ""):
-            return "URGENCIA_INFARTO"
-        if slots["tipo_sintoma"] and "dificultad para respirar" in slots["tipo_sintoma"]:
-            return "URGENCIA_RESPIRATORIA"
-
-        # Reglas para recomendaciones
-        if slots["tipo_sintoma"] and "tos" in slots["tipo_sintoma"]:
-            if slots["duracion"] and ("semana" in slots["duracion"] or "7" in slots["duracion"]):
-                return "CITA_PREVIA"
-            else:
-                return "RECOMENDACION_DESCANSO"
-
-        if slots["tipo_sintoma"] and "fiebre" in slots["tipo_sintoma"]:
-            return "RECOMENDACION_MEDICAMENTOS"
-
-        return "CONSULTA_GENERAL"
+        """
+        Motor de inferencia basado en reglas IF-THEN (src/reglas.json).
+        Solo se reevalúan las reglas de los slots que cambiaron desde la
+        última llamada de esta sesión.
+        """
+        with metrics.stage("razonar"):
+            decision, self._reglas = MOTOR.evaluar(self.contexto_paciente["slots"], self._reglas)
+        metrics.event(metrics.DECISIONES, decision)
+        return decision
 
     def procesar_mensaje(self, mensaje: str) -> str:
-        """Procesa el mensaje según el estado actual y devuelve respuesta."""
+        """
+        Procesa el mensaje según el estado actual y devuelve respuesta.
+        El mensaje solo se analiza con spaCy en los estados que extraen
+        entidades, una vez por turno.
+        """
         estado = self.contexto_paciente["estado_actual"]
 
         if estado == Estado.IDLE:
@@ -1,17 +1,201 @@
 import re
-import spacy
+from src import config, metrics
+from src.cache import ENTITY_CACHE, normalize_key
+from src.nlp import parse, parse_medical
 
-# Load spaCy model
-try:
-    nlp = spacy.load("es_core_news_sm")
-except:
-    nlp = None
 
-def extract_entities(text: str) -> dict:
+def _dolor_de(match):
+    return f"dolor de {match.group(1)}"
+
+
+def _temperatura(match):
+    return float(match.group(1).replace(",", "."))
+
+
+# Entity table: (slot, pattern, value).
+# value is None (use the matched text), a constant, or a callable(match).
+# Within a slot, earlier rows take priority over later ones. Rows of
+# different slots must not start matching at the same position.
+# Rows are word-bounded, so plural and inflected forms the old substring
+# search accepted ("mareos", "fatigado", "fuertes") are spelled out.
+ENTITY_TABLE = [
+    # Symptoms
+    ("tipo_sintoma", r"\bdolor(?:es)? (?:de )?(\w+)", None),
+    ("tipo_sintoma", r"\bme duele (?:la|el|los|las)? ?(\w+)", _dolor_de),
+    ("tipo_sintoma", r"\bfiebres?\b", "fiebre"),
+    ("tipo_sintoma", r"\btos\b", None),
+    ("tipo_sintoma", r"\bnáuseas\b", None),
+    ("tipo_sintoma", r"\bmareos?\b", "mareo"),
+    ("tipo_sintoma", r"\bvómitos?\b", None),
+    ("tipo_sintoma", r"\bdiarreas?\b", "diarrea"),
+    ("tipo_sintoma", r"\bconstipación\b", None),
+    ("tipo_sintoma", r"\binsomnio\b", None),
+    ("tipo_sintoma", r"\bcansancio\b", None),
+    ("tipo_sintoma", r"\bfatiga(?:dos?|das?)?\b", "fatiga"),
+
+    # Duration
+    ("duracion", r"\bdesde (ayer|hace (\d+) (días?|semanas?|meses?|horas?))", None),
+    ("duracion", r"\b(\d+) (días?|semanas?|meses?|horas?)\b", None),
+    ("duracion", r"\buna semana\b", None),
+    ("duracion", r"\bdos semanas\b", None),
+    ("duracion", r"\bun mes\b", None),
+    ("duracion", r"\bdesde (esta mañana|ayer|anoche|hace una hora)", None),
+    ("duracion", r"\bdesde hace (una hora|dos horas|un día|dos días)", None),
+
+    # Temperature
+    ("temperatura", r"\b(\d+(?:[.,]\d+)?) ?(?:grados?|°(?:c|C)?)", _temperatura),
+
+    # Gravity
+    ("gravedad_percibida", r"\bleve(?:s|mente)?\b", "leve"),
+    ("gravedad_percibida", r"\bmoderados?\b", "moderado"),
+    ("gravedad_percibida", r"\bmoderada(?:s|mente)?\b", "moderado"),
+    ("gravedad_percibida", r"\bgrave(?:s|mente)?\b", "grave"),
+    ("gravedad_percibida", r"\bintensos?\b", "grave"),
+    ("gravedad_percibida", r"\bfuerte(?:s|mente)?\b", "grave"),
+    ("gravedad_percibida", r"\bmuchos?\b", "grave"),
+    ("gravedad_percibida", r"\bpocos?\b", "leve"),
+]
+
+BODY_PARTS = {"cabeza", "pecho", "abdomen", "pierna", "brazo", "espalda", "cuello", "estómago"}
+
+# Labels of the rule-based pipeline (src.nlp.parse_medical) -> slot
+RULER_SLOTS = {"ZONA": "zona_afectada", "SINTOMA": "tipo_sintoma", "DURACION": "duracion", "TEMPERATURA": "temperatura"}
+
+
+class EntityEngine:
+    """
+    Compiles an entity table into a single regex with one named group per
+    row. Every row is wrapped in a lookahead so that one ``finditer`` scan
+    reports matches of all rows, including ones that overlap. At most one
+    row is reported per start position (the first one in table order),
+    hence the rule that rows of different slots must not start matching at
+    the same position.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._rows = [re.compile(pattern) for _, pattern, _ in table]
+        self._regex = re.compile("|".join(
+            f"(?=(?P<e{i}>{pattern}))" for i, (_, pattern, _) in enumerate(table)
+        ))
+
+    def _value(self, i, match):
+        value = self.table[i][2]
+        if value is None:
+            return match.group(0).strip()
+        if callable(value):
+            return value(match)
+        return value
+
+    def find_all(self, text_lower: str):
+        """
+        Return every match as (slot, value, start, end, row) in text order.
+        ``text_lower`` must already be lowercased.
+        """
+        found = []
+        for m in self._regex.finditer(text_lower):
+            i = int(m.lastgroup[1:])
+            row_match = self._rows[i].match(text_lower, m.start())
+            found.append((self.table[i][0], self._value(i, row_match),
+                          row_match.start(), row_match.end(), i))
+        return found
+
+    def extract(self, text_lower: str) -> dict:
+        """Return the best value per slot: lowest row first, then leftmost."""
+        best = {}
+        for slot, value, start, _, row in self.find_all(text_lower):
+            if slot not in best or row < best[slot][0]:
+                best[slot] = (row, value)
+        return {slot: value for slot, (_, value) in best.items()}
+
+
+ENGINE = EntityEngine(ENTITY_TABLE)
+SLOTS = ("tipo_sintoma", "duracion", "temperatura", "gravedad_percibida", "zona_afectada")
+
+# Engines restricted to a subset of slots, built on first use
+_ENGINES = {frozenset(SLOTS): ENGINE}
+
+
+def engine_for(slots) -> EntityEngine:
+    """Return the engine with only the table rows of ``slots`` (same row order)."""
+    key = frozenset(slots)
+    engine = _ENGINES.get(key)
+    if engine is None:
+        engine = EntityEngine([row for row in ENTITY_TABLE if row[0] in key])
+        _ENGINES[key] = engine
+    return engine
+
+
+def find_entities(text: str):
+    """
+    Return all regex entity matches in the text as a list of
+    (slot, value, start, end) tuples, in text order.
+    """
+    return [match[:4] for match in ENGINE.find_all(text.lower())]
+
+
+def _float(token):
+    if not token.like_num:
+        return None
+    try:
+        return float(token.text.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def ruler_entities(doc) -> dict:
+    """
+    First value per slot in a Doc of the rule-based pipeline: canonical
+    terms for zones and symptoms ("dolor" + zone becomes "dolor de <zone as
+    written>"), the matched text for durations and a float for temperatures.
+    """
+    found = {}
+    zona_texto = None
+    for ent in doc.ents:
+        slot = RULER_SLOTS.get(ent.label_)
+        if slot is None or slot in found:
+            continue
+        if slot == "zona_afectada":
+            zona_texto = ent.text.lower()
+        if slot == "temperatura":
+            # Custom "numero" patterns may match tokens that are not digits ("diez")
+            valor = next((v for v in map(_float, ent) if v is not None), None)
+            if valor is None:
+                continue
+            found[slot] = valor
+        elif slot == "duracion":
+            found[slot] = ent.text.lower()
+        else:
+            found[slot] = ent.ent_id_ or ent.text.lower()
+    if found.get("tipo_sintoma") == "dolor" and zona_texto:
+        found["tipo_sintoma"] = f"dolor de {zona_texto}"
+    return found
+
+
+def extract_entities(text: str, slots=None) -> dict:
     """
     Extract entities from the text using regex and spaCy.
+    With ``SALLEXA_ENTITY_PIPELINE=reglas`` (default) one pass of the
+    rule-based pipeline (``src.nlp.parse_medical``) gives ``zona_afectada``
+    and fills the slots the regex table did not find. With ``modelo`` the
+    zone comes from the statistical NER and ``BODY_PARTS``; the text is
+    parsed with ``src.nlp.parse`` only if ``zona_afectada`` is wanted.
+    ``slots`` restricts extraction to those slots (None = all); the others
+    are returned as None.
+    Results are memoized by normalized text and requested slots (see ``src.cache``).
     Returns a dict with extracted slots.
     """
+    slots = frozenset(SLOTS if slots is None else slots)
+    key = normalize_key(text) if len(slots) == len(SLOTS) else (normalize_key(text), slots)
+    cached = ENTITY_CACHE.get(key)
+    if cached is not None:
+        return dict(cached)
+    entities = _extract_entities(text, slots)
+    ENTITY_CACHE.put(key, dict(entities))
+    return entities
+
+
+def _extract_entities(text: str, slots=frozenset(SLOTS)) -> dict:
     entities = {
         "tipo_sintoma": None,
         "duracion": None,
@@ -20,82 +204,37 @@ def extract_entities(text: str) -> dict:
         "zona_afectada": None
     }
 
-    text_lower = text.lower()
-
-    # Extract symptoms
-    symptom_patterns = [
-        r"dolor(?:es)? (?:de )?(\w+)",
-        r"me duele (?:la|el|los|las)? ?(\w+)",
-        r"fiebre",
-        r"tos",
-        r"náuseas",
-        r"mareo",
-        r"vómitos?",
-        r"diarrea",
-        r"constipación",
-        r"insomnio",
-        r"cansancio",
-        r"fatiga"
-    ]
-    for pattern in symptom_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            if "dolor" in pattern and "de" not in pattern:
-                entities["tipo_sintoma"] = f"dolor de {match.group(1)}"
-            elif "duele" in pattern:
-                entities["tipo_sintoma"] = f"dolor de {match.group(1)}"
-            else:
-                entities["tipo_sintoma"] = match.group(0).strip()
-            break
-
-    # Extract duration
-    duration_patterns = [
-        r"desde (ayer|hace (\d+) (días?|semanas?|meses?|horas?))",
-        r"(\d+) (días?|semanas?|meses?|horas?)",
-        r"una semana",
-        r"dos semanas",
-        r"un mes",
-        r"desde (esta mañana|ayer|anoche|hace una hora)",
-        r"desde hace (una hora|dos horas|un día|dos días)"
-    ]
-    for pattern in duration_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            entities["duracion"] = match.group(0).strip()
-            break
-
-    # Extract temperature
-    temp_match = re.search(r"(\d+(?:[.,]\d+)?) ?(?:grados?|°(?:c|C)?)", text_lower)
-    if temp_match:
-        entities["temperatura"] = float(temp_match.group(1).replace(",", "."))
-
-    # Extract gravity
-    gravity_keywords = {
-        "leve": "leve",
-        "moderado": "moderado",
-        "moderada": "moderado",
-        "grave": "grave",
-        "intenso": "grave",
-        "fuerte": "grave",
-        "mucho": "grave",
-        "poco": "leve"
-    }
-    for word, level in gravity_keywords.items():
-        if word in text_lower:
-            entities["gravedad_percibida"] = level
-            break
+    # Symptoms, duration, temperature and gravity in a single pass
+    if slots - {"zona_afectada"}:
+        with metrics.stage("regex"):
+            entities.update(engine_for(slots).extract(text.lower()))
+
+    if config.ENTITY_PIPELINE == "reglas":
+        pendientes = {slot for slot in slots if entities[slot] is None and slot in RULER_SLOTS.values()}
+        # "me duele mucho la barriga" -> the regex gives "dolor de mucho"; the zone comes from the ruler
+        dolor = "tipo_sintoma" in slots and (entities["tipo_sintoma"] or "").startswith("dolor")
+        if pendientes or dolor:
+            doc = parse_medical(text)
+            if doc is not None:
+                for slot, value in ruler_entities(doc).items():
+                    if slot in pendientes:
+                        entities[slot] = value
+                    elif slot == "tipo_sintoma" and dolor and value.startswith("dolor de "):
+                        entities[slot] = value
+        return entities
 
     # Extract affected area using spaCy if available
-    if nlp:
-        doc = nlp(text)
+    if "zona_afectada" not in slots:
+        return entities
+    doc = parse(text)
+    if doc is not None:
         for ent in doc.ents:
             if ent.label_ in ["LOC", "MISC"]:
                 entities["zona_afectada"] = ent.text.lower()
         # Also check for body parts
-        body_parts = ["cabeza", "pecho", "abdomen", "pierna", "brazo", "espalda", "cuello", "estómago"]
         for token in doc:
-            if token.text.lower() in body_parts:
+            if token.text.lower() in BODY_PARTS:
                 entities["zona_afectada"] = token.text.lower()
                 break
 
-    return entities
\ No newline at end of file
+    return entities
@@ -0,0 +1,141 @@
+"""
+Ejecución del trabajo NLP fuera del event loop.
+
+spaCy, las expresiones regulares y sklearn son CPU-bound: si se ejecutan
+directamente en un handler ``async def`` bloquean a todos los usuarios.
+``NLPExecutor`` los envía a un pool de hilos o de procesos con:
+
+- timeout por petición (``TimeoutError`` → 504),
+- contrapresión: como mucho ``max_pending`` tareas en vuelo (``Saturado`` → 503),
+- orden por sesión: ``ordered(session_id)`` serializa los turnos de una misma
+  sesión, incluso si un turno anterior superó el timeout y sigue ejecutándose.
+
+Las funciones que se envían al pool (``turno_chat``, ``clasificar``,
+``clasificar_lote``) son de nivel de módulo para poder usarse también con
+procesos, y devuelven también las mediciones de ``src.metrics`` del turno para
+registrarlas en la API.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from src import metrics
+
+
+class Saturado(Exception):
+    """Hay demasiadas tareas en vuelo."""
+
+
+def turno_chat(sistema, mensaje: str):
+    """
+    Procesa un turno y devuelve ``(respuesta, sistema, mediciones)``
+    (el sistema puede ser una copia).
+    """
+    with metrics.recording() as registro:
+        respuesta = sistema.procesar_mensaje(mensaje)
+    return respuesta, sistema, registro
+
+
+def clasificar(mensaje: str):
+    """Devuelve ``(etiqueta, mediciones)``."""
+    from src.predict import classify_message
+    with metrics.recording() as registro:
+        label = classify_message(mensaje)
+    return label, registro
+
+
+def clasificar_lote(mensajes):
+    """Devuelve ``(etiquetas, mediciones)`` con una sola llamada al modelo."""
+    from src.predict_batch import classify_batch
+    with metrics.recording() as registro:
+        labels = classify_batch(mensajes)
+    return labels, registro
+
+
+class NLPExecutor:
+    def __init__(self, kind: str = "thread", workers: int = None, timeout: float = 10.0,
+                 max_pending: int = 256, initializer=None):
+        if kind not in ("thread", "process", "inline"):
+            raise ValueError(f"Tipo de executor desconocido: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.initializer = initializer   # se ejecuta en cada proceso hijo (kind="process")
+        self._pool = None
+        self._pending = 0
+        self._locks = {}      # session_id -> [asyncio.Lock, usuarios]
+        self._en_vuelo = {}   # session_id -> future del último turno
+        self.timeouts = 0
+        self.rechazadas = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+            elif self.kind == "thread":
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="nlp")
+        return self._pool
+
+    def _terminada(self, _fut):
+        self._pending -= 1
+
+    async def run(self, func, *args, key=None):
+        """Ejecuta ``func(*args)`` en el pool respetando timeout y contrapresión."""
+        if self.kind == "inline":
+            return func(*args)
+        if self._pending >= self.max_pending:
+            self.rechazadas += 1
+            raise Saturado()
+
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self._get_pool(), func, *args)
+        self._pending += 1
+        fut.add_done_callback(self._terminada)
+        if key is not None:
+            self._en_vuelo[key] = fut
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    @asynccontextmanager
+    async def ordered(self, key: str):
+        """Serializa los bloques de una misma sesión en orden de llegada."""
+        entrada = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entrada[1] += 1
+        await entrada[0].acquire()
+
+        def liberar(_fut=None):
+            entrada[0].release()
+            entrada[1] -= 1
+            if entrada[1] == 0 and self._locks.get(key) is entrada:
+                del self._locks[key]
+
+        try:
+            yield
+        finally:
+            fut = self._en_vuelo.pop(key, None)
+            if fut is not None and not fut.done():
+                # El turno superó el timeout: la sesión sigue ocupada hasta que acabe
+                fut.add_done_callback(liberar)
+            else:
+                liberar()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "tipo": self.kind,
+            "workers": self.workers,
+            "en_vuelo": self._pending,
+            "max_en_vuelo": self.max_pending,
+            "timeouts": self.timeouts,
+            "rechazadas": self.rechazadas,
+        }
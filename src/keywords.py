@@ -0,0 +1,91 @@
+"""
+Índice de palabras clave precompilado.
+
+Todas las palabras clave de todas las categorías se compilan una sola vez en
+una expresión regular con límites de palabra, de modo que un único recorrido
+del mensaje devuelve todas las categorías presentes. El coste no depende del
+número de listas ni de su orden, y se evitan coincidencias parciales como
+"tos" dentro de "gastos".
+"""
+
+import re
+from typing import Dict, Iterable, Set, Tuple
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def _tokens(kw: str) -> Tuple[str, ...]:
+    return tuple(_TOKEN.findall(kw))
+
+
+class KeywordIndex:
+    """Índice palabra clave → categorías, evaluado en una sola pasada."""
+
+    def __init__(self, categorias: Dict[str, Iterable[str]]):
+        self._categorias: Dict[str, Set[str]] = {}
+        for categoria, palabras in categorias.items():
+            for kw in palabras:
+                self._categorias.setdefault(kw.lower(), set()).add(categoria)
+
+        # Una alternativa larga puede ocultar a otra más corta contenida en
+        # ella ("dolor de cabeza" / "dolor"): se heredan sus categorías.
+        # Cada palabra clave se tokeniza una vez y se buscan sus subsecuencias
+        # contiguas de tokens en un diccionario, sin una regex por pareja.
+        por_tokens: Dict[Tuple[str, ...], str] = {
+            _tokens(kw): kw for kw in self._categorias
+        }
+        heredadas: Dict[str, Set[str]] = {}
+        for kw in self._categorias:
+            toks = _tokens(kw)
+            cats = set(self._categorias[kw])
+            for i in range(len(toks)):
+                for j in range(i + 1, len(toks) + 1):
+                    otra = por_tokens.get(toks[i:j])
+                    if otra is not None and otra != kw:
+                        cats |= self._categorias[otra]
+            heredadas[kw] = cats
+        self._categorias = heredadas
+
+        alternativas = sorted(self._categorias, key=len, reverse=True)
+        self._regex = re.compile(
+            r"\b(?:{})\b".format("|".join(re.escape(kw) for kw in alternativas))
+        ) if alternativas else None
+
+    def match(self, text: str) -> Set[str]:
+        """Devuelve el conjunto de categorías presentes en el texto."""
+        if self._regex is None:
+            return set()
+        encontradas: Set[str] = set()
+        for m in self._regex.finditer(text.lower()):
+            encontradas |= self._categorias[m.group(0)]
+        return encontradas
+
+
+# Reglas de intención del diálogo (src/dialogue.py), por orden de prioridad
+INTENCIONES_PRIORIDAD = ["urgencia", "síntomas", "administrativo", "saludo"]
+
+INTENCIONES = KeywordIndex({
+    "urgencia": [
+        "emergencia", "urgente", "grave", "muerte", "morir", "muriendo", "infarto", "accidente",
+        "sangre", "desmayo", "desmayos", "convulsiones", "dificultad para respirar"
+    ],
+    "síntomas": [
+        "dolor", "dolores", "duele", "duelen", "fiebre", "tos", "náuseas", "mareo", "mareos",
+        "vómito", "vómitos", "diarrea", "cansancio", "fatiga", "insomnio",
+        "dolor de cabeza", "dolor de estómago"
+    ],
+    "administrativo": [
+        "cita", "citas", "horario", "horarios", "turno", "turnos", "receta", "recetas",
+        "factura", "facturas", "pago", "pagos", "renovar"
+    ],
+    "saludo": ["hola", "buenas", "buenos días", "buenas tardes", "buenas noches", "hey", "hi"],
+})
+
+# Regla rápida del clasificador (src/predict.py)
+ADMIN = KeywordIndex({
+    "administrativo": [
+        "horario", "horarios", "cita", "citas", "turno", "turnos",
+        "receta", "recetas", "renovar", "agenda", "atencion", "atención",
+        "baja", "bajas", "factura", "facturación", "pago"
+    ],
+})
@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+"""
+Índice persistente y consultas sobre conversations.log.
+
+El log es JSONL de solo escritura al final. ``LogIndex`` lo mapea en memoria
+(``mmap``) y guarda en SQLite (``conversations.log.idx``) el desplazamiento en
+bytes de cada línea, indexado por sesión y por día, más un resumen por sesión
+(turnos, estado final, racha de "¿Puedes darme más información?"). ``update``
+solo procesa los bytes añadidos desde la última vez; si el fichero se ha
+truncado o rotado, el índice se reconstruye.
+
+Las consultas leen el índice y, para el contenido de una sesión, solo las
+líneas de esa sesión del mapa en memoria, así que su coste no depende del
+tamaño del log.
+
+Uso:
+    python -m src.log_index update
+    python -m src.log_index session <session_id>
+    python -m src.log_index outcomes          # estado final de las sesiones
+    python -m src.log_index turns             # sesiones por número de turnos
+    python -m src.log_index loops --min 3     # sesiones atascadas en "¿Puedes darme más información?"
+    python -m src.log_index day 2025-12-16
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import zlib
+from typing import Dict, List, Optional
+
+from src import config
+
+MAS_INFO = "¿Puedes darme más información?"
+
+# Estado de la FSM tras una respuesta, para entradas antiguas sin el campo "estado"
+_ESTADO_POR_RESPUESTA = [
+    ("¡Esto parece una URGENCIA!", "URGENCIA"),
+    ("Basado en tus síntomas, esto es", "URGENCIA"),
+    ("Por favor, llama al 112 AHORA", "URGENCIA"),
+    ("Bien, has llamado al 112", "FINALIZAR"),
+    ("De nada. Si tus síntomas empeoran", "FINALIZAR"),
+    ("Entiendo.", "RECOMENDACIONES"),
+    ("¿Hay algo más en lo que pueda ayudarte?", "RECOMENDACIONES"),
+    ("¿Desde cuándo tienes este síntoma?", "RECABANDO_DATOS"),
+    ("¿Cuál es tu temperatura?", "RECABANDO_DATOS"),
+    (MAS_INFO, "RECABANDO_DATOS"),
+]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+CREATE TABLE IF NOT EXISTS lineas (
+    offset INTEGER PRIMARY KEY,
+    longitud INTEGER NOT NULL,
+    session_id TEXT,
+    dia TEXT
+);
+CREATE INDEX IF NOT EXISTS lineas_sesion ON lineas (session_id, offset);
+CREATE INDEX IF NOT EXISTS lineas_dia ON lineas (dia);
+CREATE TABLE IF NOT EXISTS sesiones (
+    session_id TEXT PRIMARY KEY,
+    turnos INTEGER NOT NULL,
+    primero TEXT,
+    ultimo TEXT,
+    estado_final TEXT,
+    racha_mas_info INTEGER NOT NULL,
+    max_racha_mas_info INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sesiones_estado ON sesiones (estado_final);
+CREATE INDEX IF NOT EXISTS sesiones_turnos ON sesiones (turnos);
+CREATE INDEX IF NOT EXISTS sesiones_racha ON sesiones (max_racha_mas_info);
+"""
+
+
+def estado_de(entry: dict) -> Optional[str]:
+    """Estado de la FSM tras el turno: el campo "estado" o, si falta, deducido de la respuesta."""
+    if entry.get("estado"):
+        return entry["estado"]
+    respuesta = entry.get("bot_response") or ""
+    for prefijo, estado in _ESTADO_POR_RESPUESTA:
+        if respuesta.startswith(prefijo):
+            return estado
+    return "IDLE"
+
+
+class LogIndex:
+    def __init__(self, log_path: str = None, index_path: str = None):
+        self.log_path = log_path or config.LOG_FILE
+        self.index_path = index_path or self.log_path + ".idx"
+        self._db = sqlite3.connect(self.index_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_ESQUEMA)
+
+    def close(self):
+        self._db.close()
+
+    # ---- Mantenimiento del índice ----
+    def _meta(self, clave: str, defecto=None):
+        row = self._db.execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return row[0] if row else defecto
+
+    def _huella(self, mm) -> str:
+        """Identifica el fichero por su primera línea (cambia al rotar o reescribir)."""
+        fin = mm.find(b"\n")
+        return str(zlib.crc32(mm[:fin if fin >= 0 else min(len(mm), 4096)]))
+
+    def _reset(self):
+        with self._db:
+            self._db.execute("DELETE FROM lineas")
+            self._db.execute("DELETE FROM sesiones")
+            self._db.execute("DELETE FROM meta")
+
+    def update(self, batch: int = 50000) -> int:
+        """Indexa las líneas completas añadidas desde la última vez. Devuelve cuántas."""
+        try:
+            size = os.path.getsize(self.log_path)
+        except OSError:
+            self._reset()
+            return 0
+        if size == 0:
+            self._reset()
+            return 0
+
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            huella = self._huella(mm)
+            desde = int(self._meta("bytes", 0))
+            if desde > size or self._meta("huella", huella) != huella:
+                self._reset()
+                desde = 0
+
+            nuevas = 0
+            sesiones: Dict[str, list] = {}
+            lineas = []
+            pos = desde
+            while True:
+                fin = mm.find(b"\n", pos)
+                if fin < 0:
+                    break   # línea incompleta: el escritor aún no ha terminado
+                raw = mm[pos:fin]
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    entry = None
+                if isinstance(entry, dict):
+                    self._add(entry, pos, fin - pos, lineas, sesiones)
+                    nuevas += 1
+                pos = fin + 1
+                if len(lineas) >= batch:
+                    self._commit(lineas, sesiones, pos, huella)
+                    lineas, sesiones = [], {}
+            self._commit(lineas, sesiones, pos, huella)
+        return nuevas
+
+    def _add(self, entry, offset, longitud, lineas, sesiones):
+        session_id = entry.get("session_id")
+        ts = entry.get("timestamp") or ""
+        lineas.append((offset, longitud, session_id, ts[:10] or None))
+
+        s = sesiones.get(session_id)
+        if s is None:
+            row = self._db.execute(
+                "SELECT turnos, primero, ultimo, estado_final, racha_mas_info, max_racha_mas_info "
+                "FROM sesiones WHERE session_id = ?", (session_id,)).fetchone()
+            s = sesiones[session_id] = list(row) if row else [0, ts, ts, None, 0, 0]
+        s[0] += 1
+        s[2] = ts
+        s[3] = estado_de(entry)
+        if (entry.get("bot_response") or "").startswith(MAS_INFO):
+            s[4] += 1
+            s[5] = max(s[5], s[4])
+        else:
+            s[4] = 0
+
+    def _commit(self, lineas, sesiones, pos, huella):
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO lineas VALUES (?, ?, ?, ?)", lineas)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO sesiones VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(sid, *s) for sid, s in sesiones.items()])
+            self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                 [("bytes", str(pos)), ("huella", huella)])
+
+    # ---- Consultas ----
+    def session(self, session_id: str) -> List[dict]:
+        """Todas las entradas de una sesión, en orden."""
+        rows = self._db.execute(
+            "SELECT offset, longitud FROM lineas WHERE session_id = ? ORDER BY offset", (session_id,)).fetchall()
+        if not rows:
+            return []
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [json.loads(mm[offset:offset + longitud]) for offset, longitud in rows]
+
+    def outcomes(self) -> Dict[str, int]:
+        """Número de sesiones por estado final de la FSM."""
+        return dict(self._db.execute(
+            "SELECT estado_final, COUNT(*) FROM sesiones GROUP BY estado_final ORDER BY COUNT(*) DESC"))
+
+    def turns(self) -> Dict[int, int]:
+        """Número de sesiones por número de turnos."""
+        return dict(self._db.execute("SELECT turnos, COUNT(*) FROM sesiones GROUP BY turnos ORDER BY turnos"))
+
+    def loops(self, min_repeticiones: int = 2, limit: int = 100) -> List[dict]:
+        """Sesiones con al menos ``min_repeticiones`` "¿Puedes darme más información?" seguidos."""
+        rows = self._db.execute(
+            "SELECT session_id, max_racha_mas_info, turnos, estado_final, ultimo FROM sesiones "
+            "WHERE max_racha_mas_info >= ? ORDER BY max_racha_mas_info DESC LIMIT ?",
+            (min_repeticiones, limit)).fetchall()
+        return [{"session_id": r[0], "repeticiones": r[1], "turnos": r[2], "estado_final": r[3], "ultimo": r[4]}
+                for r in rows]
+
+    def day(self, dia: str) -> Dict[str, int]:
+        """Sesiones con actividad en un día (AAAA-MM-DD) y sus turnos de ese día."""
+        return dict(self._db.execute(
+            "SELECT session_id, COUNT(*) FROM lineas WHERE dia = ? GROUP BY session_id", (dia,)))
+
+    def stats(self) -> dict:
+        return {
+            "lineas": self._db.execute("SELECT COUNT(*) FROM lineas").fetchone()[0],
+            "sesiones": self._db.execute("SELECT COUNT(*) FROM sesiones").fetchone()[0],
+            "bytes_indexados": int(self._meta("bytes", 0)),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["update", "session", "outcomes", "turns", "loops", "day"])
+    parser.add_argument("arg", nargs="?", help="session_id (session) o fecha AAAA-MM-DD (day)")
+    parser.add_argument("--log", default=config.LOG_FILE)
+    parser.add_argument("--index", help="fichero del índice (por defecto <log>.idx)")
+    parser.add_argument("--min", type=int, default=2, help="repeticiones seguidas para loops")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--no-update", action="store_true", help="consultar sin indexar lo nuevo")
+    args = parser.parse_args()
+
+    index = LogIndex(args.log, args.index)
+    try:
+        if args.command == "update" or not args.no_update:
+            nuevas = index.update()
+            if args.command == "update":
+                print(f"{nuevas} líneas nuevas indexadas; {index.stats()}")
+                return
+        if args.command in ("session", "day") and not args.arg:
+            parser.error(f"{args.command} necesita un argumento")
+        if args.command == "session":
+            result = index.session(args.arg)
+        elif args.command == "outcomes":
+            result = index.outcomes()
+        elif args.command == "turns":
+            result = index.turns()
+        elif args.command == "loops":
+            result = index.loops(args.min, args.limit)
+        else:
+            result = index.day(args.arg)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Métricas en proceso con formato de texto de Prometheus.
+
+- ``Counter`` y ``Histogram`` con etiquetas, registrados en ``REGISTRY``.
+- ``stage(nombre)`` mide una etapa (formulario, intención, spaCy, regex,
+  razonar, log...) en el histograma ``sallexa_stage_seconds``.
+- ``event(counter, etiqueta)`` cuenta un resultado (p. ej. la decisión de
+  ``razonar``).
+
+Las tareas que corren en el executor pueden ejecutarse en otro proceso, donde
+estos contadores no se verían. Por eso ``recording()`` acumula las mediciones
+del hilo actual en una lista que la tarea devuelve junto a su resultado, y la
+API la aplica en su proceso con ``apply``. Fuera de ``recording()`` las
+mediciones se registran directamente.
+
+El coste por medición es un ``perf_counter`` y una búsqueda binaria en los
+buckets, así que las métricas están siempre activas. Los valores son por
+proceso: con varios workers de uvicorn cada uno expone los suyos.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Buckets de latencia (segundos): de 50 µs a 10 s
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY: Dict[str, "_Metric"] = {}
+_collectors: List[Callable] = []
+_local = threading.local()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY[name] = self
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._samples(items))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def _samples(self, items):
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                # [cuentas por bucket (+Inf al final), suma, total]
+                entry = self._values[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, *labelvalues) -> int:
+        entry = self._values.get(labelvalues)
+        return entry[2] if entry else 0
+
+    def _samples(self, items):
+        lines = []
+        for key, (counts, total, n) in items:
+            acumulado = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                acumulado += c
+                le_label = 'le="%s"' % _number(le)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le_label)} {acumulado}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+# ---- Métricas de la aplicación ----
+STAGE_SECONDS = Histogram("sallexa_stage_seconds", "Duración de cada etapa del procesamiento", ("stage",))
+REQUEST_SECONDS = Histogram("sallexa_request_seconds", "Duración de las peticiones por endpoint", ("endpoint",))
+REQUESTS = Counter("sallexa_requests_total", "Peticiones por endpoint y código HTTP", ("endpoint", "status"))
+FSM_MESSAGES = Counter("sallexa_fsm_messages_total", "Mensajes de /chat por estado de la FSM al recibirlos", ("estado",))
+INTENCIONES = Counter("sallexa_intenciones_total", "Intenciones detectadas por clasificar_intencion", ("intencion",))
+DECISIONES = Counter("sallexa_razonar_total", "Decisiones de razonar por resultado", ("decision",))
+PREDICT_BATCH_SIZE = Histogram("sallexa_predict_batch_size", "Mensajes por lote de GET /predict agrupadas", (),
+                               buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+PREDICT_BATCH_WAIT = Histogram("sallexa_predict_batch_wait_seconds", "Espera de cada petición GET /predict hasta enviar su lote")
+EXTRACCIONES = Counter("sallexa_extracciones_total", "Extracciones de entidades completas o solo de slots pendientes", ("modo",))
+
+
+def _record(kind: str, metric, value, label):
+    registro = getattr(_local, "registro", None)
+    if registro is not None:
+        registro.append((kind, metric.name, value, label))
+    elif kind == "h":
+        metric.observe(value, label)
+    else:
+        metric.inc(label)
+
+
+@contextmanager
+def stage(name: str):
+    """Mide el bloque como la etapa ``name``."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record("h", STAGE_SECONDS, time.perf_counter() - t0, name)
+
+
+def event(counter: Counter, label: str):
+    """Cuenta una ocurrencia de ``label`` en ``counter``."""
+    _record("c", counter, 1, label)
+
+
+@contextmanager
+def recording():
+    """Acumula las mediciones del hilo en una lista en lugar de registrarlas."""
+    anterior = getattr(_local, "registro", None)
+    registro = _local.registro = []
+    try:
+        yield registro
+    finally:
+        _local.registro = anterior
+        if anterior is not None:
+            anterior.extend(registro)
+
+
+def apply(registro):
+    """Registra en este proceso las mediciones devueltas por ``recording``."""
+    for kind, name, value, label in registro or ():
+        metric = REGISTRY[name]
+        if kind == "h":
+            metric.observe(value, label)
+        else:
+            metric.inc(label, amount=value)
+
+
+def register_collector(func: Callable):
+    """
+    Añade una función que se evalúa en cada ``render`` y devuelve familias
+    ``(nombre, tipo, ayuda, [(etiquetas_dict, valor), ...])``, para exponer
+    contadores que ya existen en otros módulos (cachés, sesiones, executor).
+    """
+    _collectors.append(func)
+    return func
+
+
+def render() -> str:
+    """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+    lines = []
+    for metric in list(REGISTRY.values()):
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, kind, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,143 @@
+"""
+Etapa NLP compartida.
+
+Carga una única instancia del modelo spaCy por proceso, de forma perezosa
+(en el primer uso o en el calentamiento de la API); el preprocesado y la
+extracción de entidades comparten esa instancia, y ``parse`` analiza un
+mensaje con ella.
+
+El modelo se elige con ``SALLEXA_SPACY_MODEL`` (por defecto
+``es_core_news_sm``); con un valor vacío se usa siempre el fallback sin spaCy.
+
+``get_medical_nlp`` / ``parse_medical`` son un segundo pipeline, solo para la
+extracción de entidades: ``spacy.blank("es")`` (tokenizador, sin modelo
+estadístico) con un ``entity_ruler`` construido desde la terminología
+(``SALLEXA_TERMINOLOGIA``). Marca ZONA, SINTOMA, DURACION y TEMPERATURA en
+una pasada; en ZONA y SINTOMA, ``ent.ent_id_`` es el término canónico. Si el
+fichero de terminología falta o no es válido, se avisa una vez y no hay
+pipeline (la extracción sigue solo con regex).
+"""
+
+import json
+import logging
+import threading
+from src import config, metrics
+
+_nlp = None
+_loaded = False
+_lock = threading.Lock()
+
+_medical = None
+_medical_loaded = False
+
+
+def get_nlp():
+    """Devuelve el pipeline spaCy del proceso, o None si no está disponible."""
+    global _nlp, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                _nlp = _load()
+                _loaded = True
+    return _nlp
+
+
+def _load():
+    if not config.SPACY_MODEL:
+        return None
+    # Try spaCy
+    try:
+        import spacy
+        return spacy.load(config.SPACY_MODEL)
+    except Exception:
+        return None
+
+
+def set_nlp(pipeline):
+    """Fija el pipeline del proceso (None fuerza el fallback sin spaCy)."""
+    global _nlp, _loaded
+    with _lock:
+        _nlp = pipeline
+        _loaded = True
+
+
+def parse(text: str):
+    """
+    Analiza el texto con el pipeline compartido.
+    Devuelve un Doc de spaCy, o None si spaCy/el modelo no están disponibles.
+    """
+    nlp = get_nlp()
+    if nlp is None:
+        return None
+    if not isinstance(text, str):
+        text = str(text)
+    with metrics.stage("spacy"):
+        return nlp(text)
+
+
+def get_medical_nlp():
+    """Devuelve el pipeline ligero de entidades del proceso, o None sin spaCy."""
+    global _medical, _medical_loaded
+    if not _medical_loaded:
+        with _lock:
+            if not _medical_loaded:
+                try:
+                    _medical = build_medical_pipeline(config.TERMINOLOGIA_PATH)
+                except ImportError:
+                    _medical = None
+                except (OSError, ValueError) as e:
+                    # Terminología ausente o inválida: solo regex, con un único aviso
+                    logging.getLogger(__name__).warning(
+                        "No se pudo cargar la terminología %s (%s): se extraen entidades solo con regex",
+                        config.TERMINOLOGIA_PATH, e)
+                    _medical = None
+                _medical_loaded = True
+    return _medical
+
+
+def medical_patterns(terminologia: dict, tokenizer) -> list:
+    """Patrones del ``entity_ruler`` a partir del fichero de terminología."""
+    def tokens(frase):
+        return [{"LOWER": t.lower_} for t in tokenizer(frase)]
+
+    patterns = []
+    for label, grupo in (("ZONA", "zonas"), ("SINTOMA", "sintomas")):
+        for canonico, variantes in terminologia.get(grupo, {}).items():
+            for frase in variantes:
+                patterns.append({"label": label, "pattern": tokens(frase), "id": canonico})
+
+    duracion = terminologia.get("duracion", {})
+    unidades = {"LOWER": {"IN": duracion.get("unidades", [])}}
+    patterns.append({"label": "DURACION", "pattern": [{"LIKE_NUM": True}, unidades]})
+    patterns.append({"label": "DURACION", "pattern": [{"LOWER": {"IN": duracion.get("cantidades", [])}}, unidades]})
+
+    temperatura = terminologia.get("temperatura", {})
+    numero = {"TEXT": {"REGEX": temperatura.get("numero", r"^\d+([.,]\d+)?$")}}
+    conectores = {"LOWER": {"IN": temperatura.get("conectores", [])}, "OP": "?"}
+    fiebre = {"LOWER": {"IN": terminologia.get("sintomas", {}).get("fiebre", ["fiebre"])}}
+    patterns.append({"label": "TEMPERATURA", "pattern": [numero, {"LOWER": {"IN": temperatura.get("unidades", [])}}]})
+    patterns.append({"label": "TEMPERATURA", "pattern": [numero, conectores, fiebre]})
+    patterns.append({"label": "TEMPERATURA", "pattern": [fiebre, conectores, numero]})
+    return patterns
+
+
+def build_medical_pipeline(terminologia_path: str):
+    import spacy
+
+    with open(terminologia_path, encoding="utf-8") as f:
+        terminologia = json.load(f)
+    pipeline = spacy.blank("es")
+    ruler = pipeline.add_pipe("entity_ruler")
+    ruler.add_patterns(medical_patterns(terminologia, pipeline.tokenizer))
+    return pipeline
+
+
+def parse_medical(text: str):
+    """Analiza el texto con el pipeline ligero de entidades, o None sin spaCy."""
+    pipeline = get_medical_nlp()
+    if pipeline is None:
+        return None
+    if not isinstance(text, str):
+        text = str(text)
+    with metrics.stage("entity_ruler"):
+        return pipeline(text)
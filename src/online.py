@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+Entrenamiento incremental (online) del clasificador.
+
+En lugar de reajustar TF-IDF y reentrenar con todo dataset.csv, se usa un
+``HashingVectorizer`` (sin vocabulario que ajustar) y un ``SGDClassifier``
+que se actualiza con ``partial_fit``. Cada actualización escribe una versión
+nueva y numerada del modelo y mueve el puntero ``LATEST``:
+
+    models/online/
+        v0001/model.joblib  v0001/meta.json
+        v0002/...
+        LATEST              ← "v0002"
+
+La API (``src.predict``) comprueba ``LATEST`` cada
+``SALLEXA_MODEL_CHECK_INTERVAL`` segundos y cambia de modelo en caliente,
+sin reiniciar, vaciando la caché de etiquetas.
+
+Uso:
+    python -m src.online init                       # versión inicial desde dataset.csv
+    python -m src.online update revisados.jsonl     # lote nuevo: {"message": ..., "label": ...} por línea
+    python -m src.online update nuevos.csv          # o CSV con columnas message,label
+    python -m src.online use v0003                  # volver a una versión anterior
+    python -m src.online status
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import joblib
+
+from src import config
+
+LATEST = "LATEST"
+
+# Parámetros fijos del vectorizador: deben ser iguales en todas las versiones
+VECTORIZER_PARAMS = {
+    "n_features": 2 ** 18,
+    "ngram_range": (1, 2),
+    "alternate_sign": False,
+    "norm": "l2",
+}
+
+
+def make_vectorizer():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(**VECTORIZER_PARAMS)
+
+
+def make_classifier():
+    from sklearn.linear_model import SGDClassifier
+    return SGDClassifier(loss="modified_huber", alpha=1e-5, random_state=42)
+
+
+def latest_version(path: str = None) -> Optional[str]:
+    """Nombre de la versión activa (contenido de ``LATEST``) o None."""
+    path = path or config.ONLINE_PATH
+    try:
+        with open(os.path.join(path, LATEST), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def set_latest(version: str, path: str = None):
+    """Mueve el puntero ``LATEST`` de forma atómica."""
+    path = path or config.ONLINE_PATH
+    if not os.path.isdir(os.path.join(path, version)):
+        raise ValueError(f"No existe la versión {version} en {path}")
+    tmp = os.path.join(path, LATEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(path, LATEST))
+
+
+def _next_version(path: str) -> str:
+    numeros = [int(d[1:]) for d in os.listdir(path) if d.startswith("v") and d[1:].isdigit()]
+    return f"v{max(numeros, default=0) + 1:04d}"
+
+
+class OnlinePredictor:
+    """Modelo de una versión: ``HashingVectorizer`` + clasificador lineal."""
+
+    def __init__(self, path: str = None, version: str = None):
+        path = path or config.ONLINE_PATH
+        self.version = version or latest_version(path)
+        if self.version is None:
+            raise FileNotFoundError(f"No hay versión activa en {path}")
+        self.clf = joblib.load(os.path.join(path, self.version, "model.joblib"))
+        with open(os.path.join(path, self.version, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectorizer = make_vectorizer()
+
+    def predict(self, clean_texts: List[str]) -> List[str]:
+        return [str(label) for label in self.clf.predict(self.vectorizer.transform(clean_texts))]
+
+
+def save_version(clf, meta: dict, path: str = None) -> str:
+    """Guarda una versión nueva y la activa. Devuelve su nombre."""
+    path = path or config.ONLINE_PATH
+    os.makedirs(path, exist_ok=True)
+    version = _next_version(path)
+    tmp_dir = os.path.join(path, version + ".tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    joblib.dump(clf, os.path.join(tmp_dir, "model.joblib"))
+    meta = dict(meta, version=version, creado=datetime.now().isoformat(timespec="seconds"),
+                vectorizer={k: list(v) if isinstance(v, tuple) else v for k, v in VECTORIZER_PARAMS.items()})
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_dir, os.path.join(path, version))
+    set_latest(version, path)
+    return version
+
+
+def load_labeled(path: str) -> Tuple[List[str], List[str]]:
+    """Mensajes etiquetados de un JSONL ({"message", "label"}) o CSV (message,label)."""
+    if path.endswith(".csv"):
+        import pandas as pd
+        df = pd.read_csv(path)
+        return df["message"].astype(str).tolist(), df["label"].astype(str).tolist()
+    messages, labels = [], []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not isinstance(item, dict) or "label" not in item:
+                raise ValueError(f"Línea {n}: se esperaba un objeto con 'message' y 'label'")
+            messages.append(str(item.get("message", item.get("text", ""))))
+            labels.append(str(item["label"]))
+    return messages, labels
+
+
+def _fit(clf, vectorizer, texts, labels, classes, epochs: int, batch_size: int = 1000, seed: int = 0):
+    orden = list(range(len(texts)))
+    rnd = random.Random(seed)
+    for _ in range(epochs):
+        rnd.shuffle(orden)
+        for i in range(0, len(orden), batch_size):
+            idx = orden[i:i + batch_size]
+            clf.partial_fit(vectorizer.transform([texts[j] for j in idx]), [labels[j] for j in idx], classes=classes)
+
+
+def init(data_path: str = None, epochs: int = 5, path: str = None) -> str:
+    """Crea la primera versión a partir de un conjunto etiquetado (dataset.csv)."""
+    from src.preprocess import preprocess_many
+
+    data_path = data_path or os.path.join(config.BASE_DIR, "dataset.csv")
+    messages, labels = load_labeled(data_path)
+    classes = sorted(set(labels))
+    t0 = time.perf_counter()
+    texts = preprocess_many(messages)
+    clf = make_classifier()
+    _fit(clf, make_vectorizer(), texts, labels, classes, epochs)
+    meta = {"padre": None, "muestras": len(texts), "muestras_total": len(texts),
+            "origen": os.path.basename(data_path), "clases": classes,
+            "segundos": round(time.perf_counter() - t0, 2)}
+    return save_version(clf, meta, path)
+
+
+def update(batch_path: str, epochs: int = 1, path: str = None) -> Tuple[str, dict]:
+    """
+    Actualiza la versión activa con un lote etiquetado y guarda una versión nueva.
+    Devuelve ``(version, meta)``; ``meta`` incluye la precisión sobre el lote
+    antes y después de actualizar.
+    """
+    from src.preprocess import preprocess_many
+
+    path = path or config.ONLINE_PATH
+    base = OnlinePredictor(path)
+    messages, labels = load_labeled(batch_path)
+    if not messages:
+        raise ValueError(f"{batch_path} no contiene mensajes")
+    classes = list(base.clf.classes_)
+    desconocidas = sorted(set(labels) - set(classes))
+    if desconocidas:
+        raise ValueError(f"Etiquetas desconocidas para el modelo: {desconocidas} (conocidas: {classes})")
+
+    t0 = time.perf_counter()
+    texts = preprocess_many(messages)
+    antes = _accuracy(base.predict(texts), labels)
+    _fit(base.clf, base.vectorizer, texts, labels, classes, epochs)
+    despues = _accuracy(base.predict(texts), labels)
+    meta = {"padre": base.version, "muestras": len(texts),
+            "muestras_total": base.meta.get("muestras_total", 0) + len(texts),
+            "origen": os.path.basename(batch_path), "clases": classes,
+            "precision_lote_antes": antes, "precision_lote_despues": despues,
+            "segundos": round(time.perf_counter() - t0, 2)}
+    return save_version(base.clf, meta, path), meta
+
+
+def _accuracy(predicted, labels) -> float:
+    return round(sum(p == l for p, l in zip(predicted, labels)) / len(labels), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["init", "update", "use", "status"])
+    parser.add_argument("arg", nargs="?", help="datos (init/update) o versión (use)")
+    parser.add_argument("--epochs", type=int, default=None)
+    parser.add_argument("--path", default=config.ONLINE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "init":
+        version = init(args.arg, epochs=args.epochs or 5, path=args.path)
+        print("Versión inicial:", version)
+    elif args.command == "update":
+        if not args.arg:
+            parser.error("update necesita un fichero de mensajes etiquetados")
+        version, meta = update(args.arg, epochs=args.epochs or 1, path=args.path)
+        print(f"Versión {version} (desde {meta['padre']}): {meta['muestras']} mensajes en {meta['segundos']} s, "
+              f"precisión del lote {meta['precision_lote_antes']:.2%} → {meta['precision_lote_despues']:.2%}")
+    elif args.command == "use":
+        if not args.arg:
+            parser.error("use necesita una versión")
+        set_latest(args.arg, args.path)
+        print("Versión activa:", args.arg)
+    else:
+        version = latest_version(args.path)
+        if version is None:
+            print("Sin modelo online en", args.path)
+            return
+        with open(os.path.join(args.path, version, "meta.json"), encoding="utf-8") as f:
+            print(json.dumps(json.load(f), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
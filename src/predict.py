@@ -4,30 +4,169 @@ Script para probar el clasificador de mensajes Sallexa.
 Clasifica al menos 5 mensajes nuevos como pide el README.
 """
 
-import joblib
-from preprocess import preprocess
+import os
+import threading
+import time
+from typing import Any, NamedTuple, Optional
+from src import config, metrics
+from src.cache import LABEL_CACHE, normalize_key
+from src.keywords import ADMIN
+from src.preprocess import preprocess
 
-# Cargar modelo y vectorizador guardados
-clf = joblib.load('../sallexa_model.pkl')
-vectorizer = joblib.load('../vectorizer.pkl')
+class Modelo(NamedTuple):
+    """Modelo activo, publicado con una sola asignación."""
+    kind: Optional[str]        # "online", "npy", "pickle" o None si no hay modelo
+    predictor: Any             # objeto con ``predict(textos_limpios)``, o None
+    generation: int            # aumenta en cada carga; forma parte de la clave de LABEL_CACHE
+
+
+class PicklePredictor:
+    """``predict`` sobre los pickles de sklearn (``clf`` + ``vectorizer``)."""
+
+    def __init__(self, clf, vectorizer):
+        self.clf = clf
+        self.vectorizer = vectorizer
+
+    def predict(self, clean_texts):
+        return [str(label) for label in self.clf.predict(self.vectorizer.transform(clean_texts))]
+
+
+_active: Optional[Modelo] = None
+_checked = 0.0     # última comprobación del puntero LATEST del modelo online
+_lock = threading.Lock()
+
+
+def load_model(model_path=None, vectorizer_path=None, serving_path=None):
+    """
+    Carga el modelo y lo publica con una generación nueva.
+
+    Con ``SALLEXA_SERVING_FORMAT`` = auto (por defecto) se usa, por orden, la
+    versión activa del modelo online de ``SALLEXA_ONLINE_PATH`` (ver
+    ``src.online``), el formato compacto de ``SALLEXA_SERVING_PATH`` si existe
+    (ver ``src.serving``) y los pickles de ``SALLEXA_MODEL_PATH`` y
+    ``SALLEXA_VECTORIZER_PATH``.
+    """
+    global _active, _checked
+
+    model_path = model_path or config.MODEL_PATH
+    vectorizer_path = vectorizer_path or config.VECTORIZER_PATH
+    serving_path = serving_path or config.SERVING_PATH
+    with _lock:
+        _checked = time.monotonic()
+        kind = predictor = None
+        if config.SERVING_FORMAT in ("auto", "online"):
+            try:
+                from src.online import OnlinePredictor, latest_version
+                if latest_version() is not None:
+                    kind, predictor = "online", OnlinePredictor()
+            except Exception:
+                predictor = None
+        if predictor is None and config.SERVING_FORMAT in ("auto", "npy") and os.path.isdir(serving_path):
+            try:
+                from src.serving import LeanPredictor
+                kind, predictor = "npy", LeanPredictor(serving_path)
+            except Exception:
+                predictor = None
+        if predictor is None and config.SERVING_FORMAT not in ("npy", "online"):
+            try:
+                import joblib
+                kind, predictor = "pickle", PicklePredictor(joblib.load(model_path), joblib.load(vectorizer_path))
+            except Exception:
+                predictor = None
+        if predictor is None:
+            kind = None
+
+        # Una sola asignación: quien lea _active ve el modelo anterior o el
+        # nuevo completo. Las etiquetas que aún escriban las clasificaciones en
+        # curso llevan la generación anterior y ya no se leen.
+        generation = _active.generation + 1 if _active is not None else 1
+        _active = Modelo(kind, predictor, generation)
+        LABEL_CACHE.clear()
+
+
+def ensure_model():
+    """Carga el modelo, o cambia a la última versión online si ha pasado el intervalo."""
+    if _active is None:
+        load_model()
+    elif config.SERVING_FORMAT in ("auto", "online") and time.monotonic() - _checked >= config.MODEL_CHECK_INTERVAL:
+        check_for_update()
+
+
+def check_for_update() -> bool:
+    """Recarga el modelo si el puntero LATEST del modelo online cambió."""
+    global _checked
+    _checked = time.monotonic()
+    from src.online import latest_version
+    modelo = _active
+    actual = modelo.predictor.version if modelo is not None and modelo.kind == "online" else None
+    if latest_version() == actual:
+        return False
+    load_model()
+    return True
+
+
+def active_model() -> Modelo:
+    """Devuelve el modelo activo (cargándolo o actualizándolo si hace falta)."""
+    ensure_model()
+    return _active
+
+
+def label_key(message: str, modelo: Modelo):
+    """Clave de LABEL_CACHE: generación del modelo y texto normalizado."""
+    return modelo.generation, normalize_key(message).lower()
+
+
+def get_model():
+    """Devuelve ``(clf, vectorizer)`` de los pickles (None si se sirve en otro formato)."""
+    modelo = active_model()
+    if modelo.kind != "pickle":
+        return None, None
+    return modelo.predictor.clf, modelo.predictor.vectorizer
+
+
+def model_kind():
+    """Formato del modelo activo: "online", "npy", "pickle" o None si no hay modelo."""
+    return active_model().kind
+
+
+def model_version():
+    """Versión del modelo online activo, o None con los formatos estáticos."""
+    modelo = active_model()
+    return modelo.predictor.version if modelo.kind == "online" else None
+
+
+def predict_clean(clean_texts, modelo: Modelo = None):
+    """
+    Predice las etiquetas de textos ya preprocesados con una sola llamada.
+    ``modelo`` es el de ``active_model()`` si se omite.
+    Devuelve None si no hay modelo cargado.
+    """
+    if modelo is None:
+        modelo = active_model()
+    if modelo.predictor is None:
+        return None
+    with metrics.stage("modelo"):
+        return modelo.predictor.predict(clean_texts)
 
 def classify_message(message: str):
     """Clasifica un mensaje usando el modelo guardado."""
+    modelo = active_model()   # una sola lectura: etiqueta y clave de caché del mismo modelo
+    key = label_key(message, modelo)
+    label = LABEL_CACHE.get(key)
+    if label is not None:
+        return label
+
     # Regla rápida: si contiene palabras clave administrativas, devolver "administrativo"
-    admin_keywords = [
-        "horario", "horarios", "cita", "citas", "turno", "turnos",
-        "receta", "recetas", "renovar", "agenda", "atencion", "atención",
-        "baja", "bajas", "factura", "facturación", "pago"
-    ]
-    lower = message.lower()
-    for kw in admin_keywords:
-        if kw in lower:
-            return "administrativo"
-
-    clean = preprocess(message)
-    X_new = vectorizer.transform([clean])
-    prediction = clf.predict(X_new)
-    return prediction[0]
+    if ADMIN.match(message):
+        label = "administrativo"
+    else:
+        labels = predict_clean([preprocess(message)], modelo)
+        if labels is None:
+            return "error"
+        label = labels[0]
+
+    LABEL_CACHE.put(key, label)
+    return label
 
 # Mensajes de prueba (al menos 5 como pide el README)
 test_messages = [
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Clasificación por lotes de mensajes Sallexa.
+
+Aplica la regla administrativa, preprocesa el bloque con ``preprocess_many``
+y hace una sola llamada a ``vectorizer.transform`` + ``clf.predict`` por
+bloque de mensajes, en lugar de una matriz de una fila por mensaje. Lo usan
+``POST /predict/batch`` y la CLI:
+
+    python -m src.predict_batch entrada.jsonl --output etiquetas.jsonl
+    cat mensajes.txt | python -m src.predict_batch --text
+
+La entrada JSONL admite una cadena por línea o un objeto con "message"
+(o "text"). La salida es JSONL con {"label": ..., "message": ...}.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+from typing import Iterable, Iterator, List
+
+from src import predict
+from src.cache import LABEL_CACHE
+from src.keywords import ADMIN
+from src.preprocess import preprocess_many
+
+CHUNK_SIZE = 512
+
+
+def message_from_item(item) -> str:
+    """Extrae el texto de un elemento JSON (cadena u objeto con "message"/"text")."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        value = item.get("message", item.get("text"))
+        if isinstance(value, str):
+            return value
+    raise ValueError("Cada elemento debe ser una cadena o un objeto con 'message'")
+
+
+def classify_batch(messages: List[str]) -> List[str]:
+    """
+    Clasifica una lista de mensajes con una sola llamada al modelo.
+    Los mensajes ya vistos se sirven desde la caché de etiquetas.
+    """
+    modelo = predict.active_model()   # una sola lectura: etiquetas y claves de caché del mismo modelo
+    labels = [None] * len(messages)
+    pendientes = []
+    for i, message in enumerate(messages):
+        label = LABEL_CACHE.get(predict.label_key(message, modelo))
+        if label is not None:
+            labels[i] = label
+        elif ADMIN.match(message):
+            labels[i] = "administrativo"
+        else:
+            pendientes.append(i)
+
+    if pendientes:
+        predicted = predict.predict_clean(preprocess_many([messages[i] for i in pendientes]), modelo)
+        for j, i in enumerate(pendientes):
+            if predicted is None:
+                labels[i] = "error"
+            else:
+                labels[i] = predicted[j]
+                LABEL_CACHE.put(predict.label_key(messages[i], modelo), labels[i])
+    return labels
+
+
+def iter_chunks(items: Iterable, size: int = CHUNK_SIZE) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _read_messages(stream, plain_text: bool) -> Iterator[str]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        yield line if plain_text else message_from_item(json.loads(line))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="Fichero de entrada (por defecto stdin)")
+    parser.add_argument("--output", "-o", help="Fichero de salida JSONL (por defecto stdout)")
+    parser.add_argument("--text", action="store_true", help="Entrada de texto plano, un mensaje por línea")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fin = open(args.input, encoding="utf-8") if args.input else sys.stdin
+    fout = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for chunk in iter_chunks(_read_messages(fin, args.text), args.chunk_size):
+            for message, label in zip(chunk, classify_batch(chunk)):
+                fout.write(json.dumps({"label": label, "message": message}, ensure_ascii=False) + "\n")
+    finally:
+        if args.input:
+            fin.close()
+        if args.output:
+            fout.close()
+
+
+if __name__ == "__main__":
+    main()
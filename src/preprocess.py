@@ -1,5 +1,22 @@
+import functools
 import re
 import string
+import threading
+from typing import Iterable, List
+
+from src import metrics
+from src.cache import PREPROCESS_CACHE, normalize_key
+from src.nlp import get_nlp
+
+# Componentes que el preprocesado no usa: el lematizador solo necesita POS y
+# morfología, y el texto ya llega en minúsculas (``is_sent_start`` del parser
+# no cambia el lema). Desactivarlos no cambia la salida.
+_UNUSED_PIPES = ("parser", "ner")
+
+# Recursos del fallback (stopwords y stemmer), preparados una vez por proceso
+_fallback = None
+_fallback_lock = threading.Lock()
+
 
 def _default_stopwords():
     # Small Spanish stopword list (fallback)
@@ -8,16 +25,70 @@ def _default_stopwords():
             "cuando", "muy", "sin", "sobre", "también", "me", "ya", "hay", "todos", "son", "dos", "también", "fue",
             "ha", "tener", "tengo", "tiene"}
 
-# Try spaCy
-try:
-    import spacy
+
+def _normalize(text: str) -> str:
+    """Lowercase, normalize decimals and remove punctuation."""
+    text = text.lower()
+    text = text.replace(",", ".")
+    text = re.sub(r"[{}]".format(re.escape(string.punctuation)), " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _disabled(nlp) -> List[str]:
+    return [name for name in _UNUSED_PIPES if name in nlp.pipe_names]
+
+
+def _lemmas(doc) -> str:
+    return " ".join(
+        token.lemma_
+        for token in doc
+        if not token.is_stop and not token.is_punct and token.lemma_.strip()
+    )
+
+
+def _fallback_resources():
+    """
+    ``(stopwords, stem)`` del fallback. Con NLTK: sus stopwords y el
+    SnowballStemmer con ``stem`` memoizado; si NLTK o sus datos no están
+    disponibles (la descarga se intenta una sola vez), la lista corta y sin
+    stemming.
+    """
+    global _fallback
+    if _fallback is None:
+        with _fallback_lock:
+            if _fallback is None:
+                _fallback = _load_fallback()
+    return _fallback
+
+
+def _load_fallback():
     try:
-        nlp = spacy.load("es_core_news_sm")
+        from nltk.corpus import stopwords as _nltk_stop
+        from nltk.stem import SnowballStemmer
+        import nltk
+
+        # Ensure stopwords are downloaded
+        try:
+            _ = _nltk_stop.words("spanish")
+        except Exception:
+            nltk.download("stopwords")
+
+        stop = frozenset(_nltk_stop.words("spanish"))
+        stem = functools.lru_cache(maxsize=65536)(SnowballStemmer("spanish").stem)
     except Exception:
-        nlp = None
-except Exception:
-    spacy = None
-    nlp = None
+        stop = frozenset(_default_stopwords())
+        stem = None
+    return stop, stem
+
+
+def _fallback_preprocess(text: str) -> str:
+    stop, stem = _fallback_resources()
+    cleaned = []
+    for t in re.findall(r"\w+", text, flags=re.UNICODE):
+        if t in stop:
+            continue
+        cleaned.append(stem(t) if stem else t)
+    return " ".join(cleaned)
 
 
 def preprocess(text: str):
@@ -26,61 +97,70 @@ def preprocess(text: str):
     - lowercase
     - remove punctuation
     - remove stopwords
-    - lemmatize when spaCy is available
+    - lemmatize when spaCy is available (shared pipeline, see ``src.nlp``)
+    Results are memoized by normalized text (see ``src.cache``).
     Returns a cleaned string.
     """
 
     if not isinstance(text, str):
         text = str(text)
 
-    # Lowercase
-    text = text.lower()
+    key = normalize_key(text).lower()
+    cleaned = PREPROCESS_CACHE.get(key)
+    if cleaned is None:
+        with metrics.stage("preprocess"):
+            cleaned = _preprocess(text)
+        PREPROCESS_CACHE.put(key, cleaned)
+    return cleaned
 
-    # Normalize decimals and remove punctuation
-    text = text.replace(",", ".")
-    text = re.sub(r"[{}]".format(re.escape(string.punctuation)), " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
+
+def _preprocess(text: str):
+    text = _normalize(text)
 
     # ---- spaCy branch ----
+    nlp = get_nlp()
     if nlp is not None:
-        doc = nlp(text)
-        tokens = [
-            token.lemma_
-            for token in doc
-            if not token.is_stop and not token.is_punct and token.lemma_.strip()
-        ]
-        return " ".join(tokens)
+        return _lemmas(nlp(text, disable=_disabled(nlp)))
 
     # ---- Fallback: NLTK or simple tokenizer ----
-    try:
-        from nltk.corpus import stopwords as _nltk_stop
-        from nltk.stem import SnowballStemmer
-        import nltk
+    return _fallback_preprocess(text)
 
-        # Ensure stopwords are downloaded
-        try:
-            _ = _nltk_stop.words("spanish")
-        except Exception:
-            nltk.download("stopwords")
-
-        stop = set(_nltk_stop.words("spanish"))
-        stemmer = SnowballStemmer("spanish")
-
-    except Exception:
-        stop = _default_stopwords()
-        stemmer = None
 
-    tokens = re.findall(r"\w+", text, flags=re.UNICODE)
-    cleaned = []
+def preprocess_many(texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> List[str]:
+    """
+    ``preprocess`` para muchos textos, con la misma salida que llamarlo uno a uno.
 
-    for t in tokens:
-        if t in stop:
+    Los textos repetidos (misma clave de caché) se procesan una sola vez y los
+    ya vistos se sirven desde ``PREPROCESS_CACHE``. Con spaCy, el resto pasa por
+    ``nlp.pipe`` en bloques de ``batch_size`` sin parser ni NER; ``n_process``
+    se pasa a ``nlp.pipe`` (multiproceso de spaCy) y no se usa en el fallback.
+    """
+    texts = [t if isinstance(t, str) else str(t) for t in texts]
+    keys = [normalize_key(t).lower() for t in texts]
+    results = {}
+    pendientes = {}     # clave -> primer texto con esa clave
+    for key, text in zip(keys, texts):
+        if key in results or key in pendientes:
             continue
-        if stemmer:
-            t = stemmer.stem(t)
-        cleaned.append(t)
-
-    return " ".join(cleaned)
+        cleaned = PREPROCESS_CACHE.get(key)
+        if cleaned is None:
+            pendientes[key] = text
+        else:
+            results[key] = cleaned
+
+    if pendientes:
+        with metrics.stage("preprocess"):
+            normalized = [_normalize(t) for t in pendientes.values()]
+            nlp = get_nlp()
+            if nlp is not None:
+                docs = nlp.pipe(normalized, batch_size=batch_size, n_process=n_process, disable=_disabled(nlp))
+                cleaned = [_lemmas(doc) for doc in docs]
+            else:
+                cleaned = [_fallback_preprocess(t) for t in normalized]
+        for key, value in zip(pendientes, cleaned):
+            results[key] = value
+            PREPROCESS_CACHE.put(key, value)
+    return [results[key] for key in keys]
 
 
 if __name__ == "__main__":
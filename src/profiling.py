@@ -0,0 +1,138 @@
+"""
+Perfilado bajo demanda de peticiones concretas.
+
+Con ``SALLEXA_PROFILE=1`` la API perfila con ``cProfile`` las peticiones que
+llevan la cabecera ``X-Sallexa-Profile: 1`` y, además, una fracción
+``SALLEXA_PROFILE_SAMPLE_RATE`` (0-1) del resto. Solo se perfila el trabajo
+de esa petición: ``run_profiled`` envuelve la tarea que se envía al executor,
+así que funciona igual con hilos, procesos o en línea.
+
+cProfile usa estado global del intérprete (``sys.monitoring`` desde Python
+3.12): solo puede haber un perfil activo por proceso. Si llega otra petición
+perfilada mientras tanto, se ejecuta sin perfilar. Con el executor de hilos,
+un perfil puede incluir trabajo de otros hilos del pool en ese intervalo.
+
+Cada perfil se guarda en ``SALLEXA_PROFILE_DIR`` (``profiles/``) como
+``<id>.prof`` (formato de ``pstats``: ``python -m pstats``, snakeviz...) y
+``<id>.json`` con el endpoint, la sesión, el estado de la FSM antes y después,
+la duración, el hash y la longitud del mensaje (nunca su texto) y las
+funciones con más tiempo acumulado. Se conservan los
+``SALLEXA_PROFILE_KEEP`` más recientes. ``GET /profiles`` los lista.
+
+Con el modo desactivado la API no llama a nada de este módulo.
+"""
+
+import cProfile
+import glob
+import hashlib
+import json
+import marshal
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+from src import config
+
+HEADER = "x-sallexa-profile"
+TOP = 15
+
+# Un solo perfil activo por proceso (ver el docstring del módulo)
+_active = threading.Lock()
+
+
+def requested(header_value: str = None) -> bool:
+    """¿Pide la cabecera ``X-Sallexa-Profile`` perfilar la petición?"""
+    return bool(header_value) and header_value.strip().lower() not in ("0", "false", "no")
+
+
+def wanted(header_value: str = None) -> bool:
+    """¿Perfilar esta petición? Por cabecera o por muestreo."""
+    return requested(header_value) or random.random() < config.PROFILE_SAMPLE_RATE
+
+
+def message_meta(text: str) -> dict:
+    """Metadatos del mensaje para el perfil: hash y longitud, sin el texto del paciente."""
+    return {"mensaje_sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(), "mensaje_len": len(text)}
+
+
+def run_profiled(func, *args):
+    """
+    Ejecuta ``func(*args)`` con cProfile y devuelve ``(resultado, stats, segundos)``.
+    Si ya hay un perfil activo en el proceso, ejecuta sin perfilar y ``stats`` es None.
+    """
+    if not _active.acquire(blocking=False):
+        return func(*args), None, 0.0
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:    # otra herramienta de perfilado ya está activa
+            return func(*args), None, 0.0
+        t0 = time.perf_counter()
+        try:
+            result = func(*args)
+        finally:
+            profiler.disable()
+        segundos = time.perf_counter() - t0
+        profiler.create_stats()
+        return result, profiler.stats, segundos
+    finally:
+        _active.release()
+
+
+def _top(stats, n: int = TOP) -> List[dict]:
+    filas = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:n]
+    return [
+        {"funcion": f"{os.path.basename(fichero)}:{linea}({nombre})", "llamadas": nc,
+         "propio_s": round(tt, 6), "acumulado_s": round(ct, 6)}
+        for (fichero, linea, nombre), (_cc, nc, tt, ct, _callers) in filas
+    ]
+
+
+def save(stats, segundos: float, **meta) -> dict:
+    """Guarda el perfil y sus metadatos; devuelve los metadatos."""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    ahora = datetime.now()
+    profile_id = f"{ahora:%Y%m%d-%H%M%S-%f}-{uuid.uuid4().hex[:6]}"
+    with open(os.path.join(config.PROFILE_DIR, profile_id + ".prof"), "wb") as f:
+        marshal.dump(stats, f)
+    meta = dict(meta, id=profile_id, timestamp=ahora.isoformat(timespec="seconds"),
+                segundos=round(segundos, 6), top=_top(stats))
+    with open(os.path.join(config.PROFILE_DIR, profile_id + ".json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    _prune()
+    return meta
+
+
+def _prune():
+    perfiles = sorted(glob.glob(os.path.join(config.PROFILE_DIR, "*.json")))
+    for path in perfiles[:max(0, len(perfiles) - config.PROFILE_KEEP)]:
+        for p in (path, path[:-len(".json")] + ".prof"):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def recent(limit: int = 20) -> List[dict]:
+    """Metadatos de los perfiles más recientes primero."""
+    resultado = []
+    for path in sorted(glob.glob(os.path.join(config.PROFILE_DIR, "*.json")), reverse=True)[:limit]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                resultado.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return resultado
+
+
+def prof_path(profile_id: str):
+    """Ruta del ``.prof`` de un perfil, o None si el id no es válido o no existe."""
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = os.path.join(config.PROFILE_DIR, profile_id + ".prof")
+    return path if os.path.exists(path) else None
@@ -0,0 +1,141 @@
+"""
+Motor de reglas declarativo para ``SistemaExperto.razonar``.
+
+Las reglas se leen de un fichero JSON (``src/reglas.json`` por defecto, o
+``SALLEXA_REGLAS``) con este formato:
+
+    {"por_defecto": "CONSULTA_GENERAL",
+     "reglas": [{"nombre": "fiebre_alta", "prioridad": 10, "decision": "URGENCIA_ALTA",
+                 "si": [{"slot": "temperatura", "op": ">=", "valor": 39}]}, ...]}
+
+Una regla se cumple si se cumplen todas sus condiciones, y gana la regla
+cumplida de menor ``prioridad``. Operadores:
+
+- ``presente``: el slot tiene valor,
+- ``==`` / ``!=``: igualdad con ``valor``,
+- ``>=``, ``>``, ``<=``, ``<``: el slot tiene valor y la comparación numérica se cumple,
+- ``contiene``: el slot es texto y contiene ``valor``,
+- ``contiene_alguno``: el slot es texto y contiene alguno de los textos de ``valor``.
+
+``MotorReglas`` compila las reglas una sola vez: cada regla ocupa un bit según
+su prioridad y cada slot tiene la máscara de las reglas que dependen de él.
+``evaluar`` recibe el estado de la evaluación anterior de la sesión y solo
+vuelve a evaluar las reglas de los slots que han cambiado; la decisión es el
+bit más bajo de la máscara de reglas cumplidas.
+"""
+
+import json
+import operator
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import config
+
+
+def _comparacion(op):
+    def condicion(valor, esperado):
+        return bool(valor) and op(valor, esperado)
+    return condicion
+
+
+def _contiene(valor, esperado):
+    return isinstance(valor, str) and esperado in valor
+
+
+def _contiene_alguno(valor, esperados):
+    return isinstance(valor, str) and any(e in valor for e in esperados)
+
+
+OPERADORES: Dict[str, Callable[[Any, Any], bool]] = {
+    "presente": lambda valor, _esperado: bool(valor),
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": _comparacion(operator.ge),
+    ">": _comparacion(operator.gt),
+    "<=": _comparacion(operator.le),
+    "<": _comparacion(operator.lt),
+    "contiene": _contiene,
+    "contiene_alguno": _contiene_alguno,
+}
+
+
+class Regla:
+    __slots__ = ("nombre", "prioridad", "decision", "condiciones", "slots")
+
+    def __init__(self, nombre: str, prioridad: int, decision: str, condiciones: List[Tuple[str, Callable, Any]]):
+        self.nombre = nombre
+        self.prioridad = prioridad
+        self.decision = decision
+        self.condiciones = condiciones
+        self.slots = {slot for slot, _, _ in condiciones}
+
+    def cumple(self, slots: Dict[str, Any]) -> bool:
+        for slot, condicion, esperado in self.condiciones:
+            if not condicion(slots.get(slot), esperado):
+                return False
+        return True
+
+
+class MotorReglas:
+    """Reglas compiladas e indexadas por slot."""
+
+    def __init__(self, reglas: List[dict], por_defecto: str):
+        compiladas = []
+        for i, r in enumerate(reglas):
+            nombre = r.get("nombre", f"regla_{i}")
+            condiciones = []
+            for c in r.get("si", []):
+                if c.get("op") not in OPERADORES:
+                    raise ValueError(f"Operador desconocido en la regla {nombre}: {c.get('op')}")
+                condiciones.append((c["slot"], OPERADORES[c["op"]], c.get("valor")))
+            compiladas.append(Regla(nombre, r["prioridad"], r["decision"], condiciones))
+
+        # Bit i = i-ésima regla por prioridad (el orden del fichero desempata)
+        self.reglas = sorted(compiladas, key=lambda regla: regla.prioridad)
+        self.por_defecto = por_defecto
+        self.indice: Dict[str, int] = {}      # slot -> máscara de reglas que lo usan
+        self.sin_condiciones = 0              # reglas que siempre se cumplen
+        for bit, regla in enumerate(self.reglas):
+            if not regla.slots:
+                self.sin_condiciones |= 1 << bit
+            for slot in regla.slots:
+                self.indice[slot] = self.indice.get(slot, 0) | (1 << bit)
+        self.slots = tuple(self.indice)
+
+    @classmethod
+    def from_file(cls, path: str) -> "MotorReglas":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["reglas"], data.get("por_defecto", "CONSULTA_GENERAL"))
+
+    def evaluar(self, slots: Dict[str, Any], previo: Optional[tuple] = None) -> Tuple[str, tuple]:
+        """
+        Devuelve ``(decision, estado)``. ``estado`` se pasa como ``previo`` en la
+        siguiente llamada de la misma sesión para reevaluar solo lo que cambió.
+        """
+        valores = tuple(slots.get(slot) for slot in self.slots)
+        if previo is None:
+            pendientes = (1 << len(self.reglas)) - 1
+            cumplidas = self.sin_condiciones
+        else:
+            anteriores, cumplidas = previo
+            pendientes = 0
+            for slot, valor, anterior in zip(self.slots, valores, anteriores):
+                if valor != anterior:
+                    pendientes |= self.indice[slot]
+
+        while pendientes:
+            bajo = pendientes & -pendientes
+            pendientes ^= bajo
+            if self.reglas[bajo.bit_length() - 1].cumple(slots):
+                cumplidas |= bajo
+            else:
+                cumplidas &= ~bajo
+
+        if cumplidas:
+            decision = self.reglas[(cumplidas & -cumplidas).bit_length() - 1].decision
+        else:
+            decision = self.por_defecto
+        return decision, (valores, cumplidas)
+
+
+MOTOR = MotorReglas.from_file(config.REGLAS_PATH)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Formato compacto de inferencia para servir el clasificador sin sklearn.
+
+``export`` convierte un ``TfidfVectorizer`` entrenado y un clasificador lineal
+(LogisticRegression, LinearSVC o MultinomialNB) en un directorio de ficheros
+``.npy`` que se pueden mapear en memoria (``np.load(mmap_mode="r")``), de modo
+que todos los workers de una máquina comparten una sola copia:
+
+- ``vocab.npy``: términos ordenados (búsqueda con ``np.searchsorted``),
+- ``idf.npy``: vector IDF,
+- ``coef.npy`` / ``intercept.npy``: matriz de pesos por clase y sesgos,
+- ``classes.npy`` y ``meta.json`` (parámetros del vectorizador).
+
+``LeanPredictor`` reproduce TF-IDF + producto disperso directamente, sin la
+validación de sklearn por llamada, y da las mismas etiquetas que el pickle.
+
+Uso (convierte los pickles actuales sin reentrenar):
+    python -m src.serving export
+"""
+
+import argparse
+import json
+import os
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+from src import config
+
+FORMAT_VERSION = 1
+
+
+def export(vectorizer, clf, path: str):
+    """Guarda el vectorizador y el clasificador en formato compacto en ``path``."""
+    if vectorizer.analyzer != "word" or vectorizer.tokenizer is not None or vectorizer.preprocessor is not None:
+        raise ValueError("Solo se admite TfidfVectorizer con analyzer='word' y tokenización por defecto")
+
+    terms = vectorizer.get_feature_names_out()
+    order = np.argsort(terms, kind="stable")
+
+    if hasattr(clf, "coef_"):
+        coef = np.asarray(clf.coef_)
+        intercept = np.asarray(clf.intercept_)
+    elif hasattr(clf, "feature_log_prob_"):
+        # MultinomialNB: log P(c) + sum_j x_j log P(j|c)
+        coef = np.asarray(clf.feature_log_prob_)
+        intercept = np.asarray(clf.class_log_prior_)
+    else:
+        raise ValueError(f"Clasificador no lineal: {type(clf).__name__}")
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "vocab.npy"), terms[order].astype(str))
+    np.save(os.path.join(path, "idf.npy"), np.asarray(vectorizer.idf_, dtype=np.float64)[order])
+    np.save(os.path.join(path, "coef.npy"), np.ascontiguousarray(coef[:, order], dtype=np.float64))
+    np.save(os.path.join(path, "intercept.npy"), np.asarray(intercept, dtype=np.float64))
+    np.save(os.path.join(path, "classes.npy"), np.asarray(clf.classes_).astype(str))
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "estimator": type(clf).__name__,
+        "lowercase": bool(vectorizer.lowercase),
+        "token_pattern": vectorizer.token_pattern,
+        "ngram_range": list(vectorizer.ngram_range),
+        "norm": vectorizer.norm,
+        "sublinear_tf": bool(vectorizer.sublinear_tf),
+        "use_idf": bool(vectorizer.use_idf),
+        "binary": bool(vectorizer.binary),
+    }
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+class LeanPredictor:
+    """Predicción TF-IDF + modelo lineal con arrays NumPy (mapeados en memoria)."""
+
+    def __init__(self, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Versión de formato no soportada en {path}")
+        mode = "r" if mmap else None
+        self.vocab = np.load(os.path.join(path, "vocab.npy"), mmap_mode=mode)
+        self.idf = np.load(os.path.join(path, "idf.npy"), mmap_mode=mode)
+        self.coef = np.load(os.path.join(path, "coef.npy"), mmap_mode=mode)
+        self.intercept = np.load(os.path.join(path, "intercept.npy"))
+        self.classes = [str(c) for c in np.load(os.path.join(path, "classes.npy"))]
+        self._token_re = re.compile(self.meta["token_pattern"])
+        self._ngram_min, self._ngram_max = self.meta["ngram_range"]
+
+    def _ngrams(self, text: str) -> List[str]:
+        if self.meta["lowercase"]:
+            text = text.lower()
+        tokens = self._token_re.findall(text)
+        if self._ngram_max == 1:
+            return tokens
+        grams = list(tokens) if self._ngram_min == 1 else []
+        for n in range(max(2, self._ngram_min), self._ngram_max + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def _features(self, text: str):
+        """Índices de columnas y pesos TF-IDF normalizados de un texto."""
+        counts = Counter(self._ngrams(text))
+        if not counts:
+            return None, None
+        terms = np.array(list(counts))
+        pos = np.searchsorted(self.vocab, terms)
+        pos_ok = np.minimum(pos, len(self.vocab) - 1)
+        hit = self.vocab[pos_ok] == terms
+        if not hit.any():
+            return None, None
+        ids = pos_ok[hit]
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))[hit]
+        if self.meta["binary"]:
+            tf = np.ones_like(tf)
+        elif self.meta["sublinear_tf"]:
+            tf = 1.0 + np.log(tf)
+        weights = tf * self.idf[ids] if self.meta["use_idf"] else tf
+        if self.meta["norm"] == "l2":
+            weights = weights / np.sqrt(np.dot(weights, weights))
+        elif self.meta["norm"] == "l1":
+            weights = weights / np.abs(weights).sum()
+        return ids, weights
+
+    def decision_function(self, text: str) -> np.ndarray:
+        ids, weights = self._features(text)
+        if ids is None:
+            return np.array(self.intercept, dtype=np.float64)
+        return self.coef[:, ids] @ weights + self.intercept
+
+    def predict(self, texts: List[str]) -> List[str]:
+        labels = []
+        for text in texts:
+            scores = self.decision_function(text)
+            if len(self.classes) == 2 and scores.shape[0] == 1:
+                labels.append(self.classes[int(scores[0] > 0)])
+            else:
+                labels.append(self.classes[int(np.argmax(scores))])
+        return labels
+
+
+def verify(predictor: LeanPredictor, vectorizer, clf, texts: List[str]) -> int:
+    """Número de textos en los que el predictor compacto difiere del pickle."""
+    expected = [str(label) for label in clf.predict(vectorizer.transform(texts))]
+    return sum(a != b for a, b in zip(predictor.predict(texts), expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--model", default=config.MODEL_PATH)
+    parser.add_argument("--vectorizer", default=config.VECTORIZER_PATH)
+    parser.add_argument("--output", default=config.SERVING_PATH)
+    args = parser.parse_args()
+
+    import joblib
+    import pandas as pd
+    from src.preprocess import preprocess_many
+
+    clf = joblib.load(args.model)
+    vectorizer = joblib.load(args.vectorizer)
+    export(vectorizer, clf, args.output)
+    print("Guardado formato compacto en", args.output)
+
+    messages = pd.read_csv(os.path.join(config.BASE_DIR, "dataset.csv"))["message"].tolist()
+    texts = preprocess_many(messages)
+    diff = verify(LeanPredictor(args.output), vectorizer, clf, texts)
+    print(f"Etiquetas distintas del pickle: {diff} de {len(texts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Almacenes de sesiones de diálogo.
+
+Todos los backends exponen la misma interfaz (``get_or_create``, ``save``,
+``delete``, ``purge``, ``stats``):
+
+- ``SessionStore``: en memoria del proceso. Mantiene como mucho
+  ``max_sessions`` sesiones, expulsa la menos usada recientemente (LRU) y
+  caduca las inactivas durante más de ``ttl`` segundos.
+- ``SQLiteSessionStore``: fichero SQLite en modo WAL compartido por todos los
+  workers de la máquina, sin servicios externos. Permite ``uvicorn --workers N``.
+
+``create_session_store`` elige el backend según ``SALLEXA_SESSION_BACKEND``.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from src import config
+from src.dialogue import SistemaExperto
+
+
+class _Entrada:
+    __slots__ = ("sistema", "ultimo_acceso")
+
+    def __init__(self, sistema: SistemaExperto, ultimo_acceso: float):
+        self.sistema = sistema
+        self.ultimo_acceso = ultimo_acceso
+
+
+class SessionStore:
+    """Sesiones en memoria con expulsión LRU y caducidad por inactividad."""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 1800, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._clock = clock
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.creadas = 0
+        self.expulsadas = 0
+        self.caducadas = 0
+
+    def _purgar_caducadas(self, ahora: float):
+        # El OrderedDict está ordenado por último acceso: las caducadas van primero
+        while self._entradas:
+            session_id, entrada = next(iter(self._entradas.items()))
+            if ahora - entrada.ultimo_acceso < self.ttl:
+                break
+            del self._entradas[session_id]
+            self.caducadas += 1
+
+    def get_or_create(self, session_id: str) -> SistemaExperto:
+        ahora = self._clock()
+        with self._lock:
+            self._purgar_caducadas(ahora)
+            entrada = self._entradas.get(session_id)
+            if entrada is not None:
+                entrada.ultimo_acceso = ahora
+                self._entradas.move_to_end(session_id)
+                return entrada.sistema
+
+            while len(self._entradas) >= self.max_sessions:
+                self._entradas.popitem(last=False)
+                self.expulsadas += 1
+            entrada = _Entrada(SistemaExperto(), ahora)
+            self._entradas[session_id] = entrada
+            self.creadas += 1
+            return entrada.sistema
+
+    def save(self, session_id: str, sistema: SistemaExperto):
+        """Guarda el sistema (puede ser una copia devuelta por un pool de procesos)."""
+        with self._lock:
+            entrada = self._entradas.get(session_id)
+            if entrada is not None:
+                entrada.sistema = sistema
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._entradas.pop(session_id, None)
+
+    def purge(self):
+        """Elimina ya las sesiones caducadas (también ocurre en cada acceso)."""
+        with self._lock:
+            self._purgar_caducadas(self._clock())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "residentes": len(self._entradas),
+                "max_sesiones": self.max_sessions,
+                "creadas": self.creadas,
+                "expulsadas_lru": self.expulsadas,
+                "caducadas_ttl": self.caducadas,
+            }
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entradas
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+
+class SQLiteSessionStore:
+    """
+    Sesiones serializadas (``SistemaExperto.to_dict``) en una tabla SQLite.
+
+    Cada hilo usa su propia conexión. Con WAL las lecturas no bloquean a las
+    escrituras, así que varios procesos comparten el fichero con un coste de
+    una SELECT y un UPSERT por turno. La limpieza de sesiones caducadas y el
+    recorte a ``max_sessions`` se hacen cada ``purge_every`` escrituras.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl: float = 1800,
+                 purge_every: int = 500, clock=time.time):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._clock = clock
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self.creadas = 0
+        self.expulsadas = 0
+        self.caducadas = 0
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sesiones ("
+            " id TEXT PRIMARY KEY,"
+            " contexto TEXT NOT NULL,"
+            " actualizado REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sesiones_actualizado ON sesiones(actualizado)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_or_create(self, session_id: str) -> SistemaExperto:
+        fila = self._conn().execute(
+            "SELECT contexto FROM sesiones WHERE id = ? AND actualizado >= ?",
+            (session_id, self._clock() - self.ttl),
+        ).fetchone()
+        if fila is not None:
+            return SistemaExperto.from_dict(json.loads(fila[0]))
+        with self._lock:
+            self.creadas += 1
+        return SistemaExperto()
+
+    def save(self, session_id: str, sistema: SistemaExperto):
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO sesiones (id, contexto, actualizado) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET contexto = excluded.contexto, actualizado = excluded.actualizado",
+            (session_id, json.dumps(sistema.to_dict(), ensure_ascii=False), self._clock()),
+        )
+        conn.commit()
+        with self._lock:
+            self._escrituras += 1
+            purgar = self._escrituras % self.purge_every == 0
+        if purgar:
+            self.purge()
+
+    def delete(self, session_id: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM sesiones WHERE id = ?", (session_id,))
+        conn.commit()
+
+    def purge(self):
+        """Borra las sesiones caducadas y recorta a ``max_sessions`` (las más antiguas)."""
+        conn = self._conn()
+        caducadas = conn.execute(
+            "DELETE FROM sesiones WHERE actualizado < ?", (self._clock() - self.ttl,)
+        ).rowcount
+        expulsadas = conn.execute(
+            "DELETE FROM sesiones WHERE id IN ("
+            " SELECT id FROM sesiones ORDER BY actualizado DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        ).rowcount
+        conn.commit()
+        with self._lock:
+            self.caducadas += caducadas
+            self.expulsadas += expulsadas
+
+    def stats(self) -> dict:
+        residentes = self._conn().execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+        with self._lock:
+            return {
+                "residentes": residentes,
+                "max_sesiones": self.max_sessions,
+                "creadas": self.creadas,
+                "expulsadas_lru": self.expulsadas,
+                "caducadas_ttl": self.caducadas,
+            }
+
+    def __contains__(self, session_id: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM sesiones WHERE id = ?", (session_id,)
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sesiones").fetchone()[0]
+
+
+def create_session_store():
+    """Crea el almacén configurado en ``SALLEXA_SESSION_BACKEND`` (memory | sqlite)."""
+    if config.SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(config.SESSION_DB, max_sessions=config.SESSION_MAX, ttl=config.SESSION_TTL)
+    if config.SESSION_BACKEND != "memory":
+        raise ValueError(f"SALLEXA_SESSION_BACKEND desconocido: {config.SESSION_BACKEND}")
+    return SessionStore(max_sessions=config.SESSION_MAX, ttl=config.SESSION_TTL)
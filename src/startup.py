@@ -0,0 +1,45 @@
+"""
+Calentamiento de un worker.
+
+``warmup`` carga el pipeline spaCy, el pipeline ligero de entidades (con
+``SALLEXA_ENTITY_PIPELINE=reglas``) y el modelo de clasificación y procesa un
+mensaje de prueba, midiendo cuánto tarda cada paso. Así el primer usuario de
+un worker nuevo no paga la carga de modelos. La API lo llama al arrancar si
+``SALLEXA_WARMUP`` está activo, y el pool de procesos en cada proceso hijo.
+"""
+
+import os
+import time
+
+# Informe del último calentamiento de este proceso
+report = {}
+
+
+def warmup() -> dict:
+    from src import config
+    from src.dialogue import SistemaExperto
+    from src.nlp import get_medical_nlp, get_nlp
+    from src.predict import classify_message, model_kind
+
+    t0 = time.perf_counter()
+    nlp = get_nlp()
+    if config.ENTITY_PIPELINE == "reglas":
+        get_medical_nlp()
+    t1 = time.perf_counter()
+    kind = model_kind()
+    t2 = time.perf_counter()
+    classify_message("me duele la cabeza desde ayer")
+    SistemaExperto().procesar_mensaje("me duele la cabeza desde ayer")
+    t3 = time.perf_counter()
+
+    report.clear()
+    report.update({
+        "pid": os.getpid(),
+        "spacy": nlp is not None,
+        "modelo": kind,
+        "carga_spacy_s": round(t1 - t0, 4),
+        "carga_modelo_s": round(t2 - t1, 4),
+        "primer_mensaje_s": round(t3 - t2, 4),
+        "total_s": round(t3 - t0, 4),
+    })
+    return report
@@ -1,20 +1,27 @@
 import os
+import time
 import joblib
+import argparse
 import collections
 import re
 import string
+import sys
+import zlib
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
+from sklearn.base import clone
+from sklearn.model_selection import (ParameterGrid, StratifiedKFold, cross_val_predict, cross_validate,
+                                     train_test_split)
+from sklearn.pipeline import Pipeline
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.linear_model import LogisticRegression
 from sklearn.svm import LinearSVC
 from sklearn.metrics import classification_report, confusion_matrix
 
-from src.preprocess import preprocess  # tu función de preprocess
+from src.preprocess import preprocess_many  # tu función de preprocess, por lotes
+from src.serving import LeanPredictor, export as export_serving, verify as verify_serving
 
 
 def load_data(path=None):
@@ -31,7 +38,7 @@ def train_and_evaluate():
     print("Distribución de clases:", collections.Counter(labels))
 
     # Preprocesar mensajes
-    X_text = [preprocess(m) for m in messages]
+    X_text = preprocess_many(messages)
 
     # Vectorización TF-IDF con mejoras
     vectorizer = TfidfVectorizer(
@@ -79,12 +86,7 @@ def train_and_evaluate():
 
     # Guardar modelo y vectorizador
     out_dir = os.path.dirname(os.path.dirname(__file__))
-    model_path = os.path.join(out_dir, 'sallexa_model.pkl')
-    vec_path = os.path.join(out_dir, 'vectorizer.pkl')
-    joblib.dump(best_clf, model_path)
-    joblib.dump(vectorizer, vec_path)
-    print("\nGuardado modelo en", model_path)
-    print("Guardado vectorizador en", vec_path)
+    save_model(vectorizer, best_clf, out_dir, X_text)
 
     # Guardar reporte resumido
     with open(os.path.join(out_dir, 'train_report.txt'), 'w', encoding='utf8') as f:
@@ -92,22 +94,301 @@ def train_and_evaluate():
         f.write(f"best_f1_macro: {best_score}\n")
         f.write(f"classes_distribution: {collections.Counter(labels)}\n")
 
+    save_confusion_matrix(y_test, best_pred, out_dir)
+
+
+def save_model(vectorizer, clf, out_dir, X_text):
+    """Guarda modelo y vectorizador (pickles) y el formato compacto de inferencia."""
+    model_path = os.path.join(out_dir, 'sallexa_model.pkl')
+    vec_path = os.path.join(out_dir, 'vectorizer.pkl')
+    joblib.dump(clf, model_path)
+    joblib.dump(vectorizer, vec_path)
+    print("\nGuardado modelo en", model_path)
+    print("Guardado vectorizador en", vec_path)
+
+    # Exportar formato compacto de inferencia (ver src/serving.py)
+    serving_path = os.path.join(out_dir, 'serving')
+    export_serving(vectorizer, clf, serving_path)
+    diff = verify_serving(LeanPredictor(serving_path), vectorizer, clf, X_text)
+    print("Guardado formato compacto en", serving_path, f"(etiquetas distintas del pickle: {diff})")
+
+
+def save_confusion_matrix(y_true, y_pred, out_dir):
     # Guardar matriz de confusión
-    cm = confusion_matrix(y_test, best_pred, labels=list(sorted(set(y))))
-    df_cm = pd.DataFrame(cm, index=sorted(set(y)), columns=sorted(set(y)))
+    classes = sorted(set(y_true))
+    cm = confusion_matrix(y_true, y_pred, labels=classes)
+    df_cm = pd.DataFrame(cm, index=classes, columns=classes)
     cm_path = os.path.join(out_dir, "confusion_matrix.csv")
     df_cm.to_csv(cm_path)
     print("Guardada matriz de confusión en", cm_path)
 
     # Guardar imagen de matriz de confusión
+    try:
+        plot_confusion_matrix(df_cm, os.path.join(out_dir, "confusion_matrix.png"))
+        print("Guardada imagen de matriz de confusión")
+    except ImportError as e:
+        print("No se pudo dibujar la matriz de confusión:", e)
+
+
+# Rejilla de selección de modelo: vectorizador × clasificador
+SELECTION_GRID = [
+    {
+        "tfidf__ngram_range": [(1, 1), (1, 2)],
+        "tfidf__min_df": [1, 2],
+        "clf": [MultinomialNB()],
+        "clf__alpha": [0.1, 0.5, 1.0],
+    },
+    {
+        "tfidf__ngram_range": [(1, 1), (1, 2)],
+        "tfidf__min_df": [1, 2],
+        "clf": [LogisticRegression(max_iter=3000, class_weight='balanced')],
+        "clf__C": [0.5, 1.0, 4.0],
+    },
+    {
+        "tfidf__ngram_range": [(1, 1), (1, 2)],
+        "tfidf__min_df": [1, 2],
+        "clf": [LinearSVC(class_weight='balanced')],
+        "clf__C": [0.1, 0.5, 1.0],
+    },
+]
+
+
+def select_model(n_splits=5, n_jobs=-1, std_weight=1.0):
+    """
+    Selección de modelo con validación cruzada estratificada.
+
+    Evalúa en paralelo (``n_jobs=-1``: todos los núcleos) cada combinación de
+    ``SELECTION_GRID`` con ``n_splits`` folds y elige la de mayor
+    ``media - std_weight * desviación`` del F1 macro, es decir, buena y estable.
+    Escribe la tabla completa en ``model_selection.csv``, reentrena la elegida
+    con todos los datos y guarda los artefactos como ``train_and_evaluate``.
+    """
+    messages, labels = load_data()
+    print("Dataset size:", len(messages))
+    print("Distribución de clases:", collections.Counter(labels))
+
+    X_text = preprocess_many(messages)
+
+    pipeline = Pipeline([
+        ("tfidf", TfidfVectorizer(max_df=0.9)),
+        ("clf", LogisticRegression()),
+    ])
+    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    candidatos = list(ParameterGrid(SELECTION_GRID))
+    # Una tarea por combinación (en paralelo); cross_validate da el tiempo de cada fit
+    t0 = time.perf_counter()
+    resultados = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(cross_validate)(clone(pipeline).set_params(**params), X_text, labels, cv=cv,
+                                       scoring="f1_macro", error_score=np.nan)
+        for params in candidatos
+    )
+    wall = time.perf_counter() - t0
+    print(f"\n{len(candidatos)} combinaciones × {n_splits} folds en {wall:.1f} s")
+
+    test_score = np.array([r["test_score"] for r in resultados])    # combinaciones × folds
+    fit_time = np.array([r["fit_time"] for r in resultados])
+    score_time = np.array([r["score_time"] for r in resultados])
+    table = pd.DataFrame({
+        "model": [type(p["clf"]).__name__ for p in candidatos],
+        "params": [str({k: v for k, v in p.items() if k != "clf"}) for p in candidatos],
+        "mean_f1_macro": test_score.mean(axis=1),
+        "std_f1_macro": test_score.std(axis=1),
+        "selection_score": test_score.mean(axis=1) - std_weight * test_score.std(axis=1),
+        "mean_fit_time_s": fit_time.mean(axis=1),
+        "std_fit_time_s": fit_time.std(axis=1),
+        "mean_score_time_s": score_time.mean(axis=1),
+    })
+    for i in range(n_splits):
+        table[f"split{i}_f1_macro"] = test_score[:, i]
+    for i in range(n_splits):
+        table[f"split{i}_fit_time_s"] = fit_time[:, i]
+    # Empates: el más rápido de entrenar
+    table = table.sort_values(["selection_score", "mean_fit_time_s"], ascending=[False, True],
+                              na_position="last")
+
+    out_dir = os.path.dirname(os.path.dirname(__file__))
+    table_path = os.path.join(out_dir, "model_selection.csv")
+    table.to_csv(table_path, index=False)
+    print("Guardada tabla de selección en", table_path)
+    print(table.head(10).to_string(index=False))
+
+    best = candidatos[table.index[0]]
+    chosen = clone(pipeline).set_params(**best)
+
+    # Matriz de confusión con predicciones fuera de fold del modelo elegido
+    y_pred = cross_val_predict(chosen, X_text, labels, cv=cv, n_jobs=n_jobs)
+
+    chosen.fit(X_text, labels)
+    save_model(chosen.named_steps["tfidf"], chosen.named_steps["clf"], out_dir, X_text)
+
+    row = table.iloc[0]
+    with open(os.path.join(out_dir, 'train_report.txt'), 'w', encoding='utf8') as f:
+        f.write(f"best_model: {row['model']}\n")
+        f.write(f"best_params: {row['params']}\n")
+        f.write(f"best_f1_macro: {row['mean_f1_macro']}\n")
+        f.write(f"best_f1_macro_std: {row['std_f1_macro']}\n")
+        f.write(f"selection: stratified {n_splits}-fold, mean - {std_weight} * std\n")
+        f.write(f"selection_wall_time_s: {wall:.1f}\n")
+        f.write(f"classes_distribution: {collections.Counter(labels)}\n")
+
+    save_confusion_matrix(labels, y_pred, out_dir)
+
+
+def iter_labeled_chunks(path, chunk_size):
+    """Lee el CSV por bloques y devuelve ``(mensajes, etiquetas)`` de cada bloque."""
+    for chunk in pd.read_csv(path, usecols=["message", "label"], chunksize=chunk_size):
+        chunk = chunk.dropna()
+        yield chunk["message"].astype(str).tolist(), chunk["label"].astype(str).tolist()
+
+
+def in_holdout(message, holdout_pct):
+    """Reparto estable por hash del texto: un mensaje repetido cae siempre en el mismo lado."""
+    return zlib.crc32(message.strip().lower().encode("utf-8")) % 100 < holdout_pct
+
+
+def macro_f1(confusion, classes):
+    """F1 macro a partir de la matriz de confusión acumulada {(real, predicha): n}."""
+    f1s = []
+    for c in classes:
+        tp = confusion.get((c, c), 0)
+        fp = sum(n for (real, pred), n in confusion.items() if pred == c and real != c)
+        fn = sum(n for (real, pred), n in confusion.items() if real == c and pred != c)
+        f1s.append(2 * tp / (2 * tp + fp + fn) if tp else 0.0)
+    return sum(f1s) / len(f1s)
+
+
+def _peak_memory_mb():
+    """Memoria máxima del proceso en MB, o None donde no hay ``resource`` (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en bytes en macOS y en kilobytes en Linux
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+def train_streaming(path=None, chunk_size=5000, epochs=3, holdout_pct=10, publish=False):
+    """
+    Entrenamiento fuera de memoria para corpus mayores que la RAM.
+
+    Lee el CSV por bloques de ``chunk_size`` filas, preprocesa cada bloque al
+    leerlo y lo pasa a ``HashingVectorizer`` + ``SGDClassifier.partial_fit``
+    (los de ``src.online``), sin guardar el texto ni la matriz completos. Un
+    ``holdout_pct`` % de los mensajes, elegido por hash del texto, no se usa
+    para entrenar y se evalúa al final en otra pasada en streaming, acumulando
+    solo la matriz de confusión. El modelo se guarda como una versión nueva en
+    ``config.STREAMING_PATH`` (``models/streaming``); con ``publish`` se guarda
+    en el modelo online (``config.ONLINE_PATH``), que la API en modo ``auto``
+    prefiere al TF-IDF y carga en caliente.
+    """
+    from src import config
+    from src.online import make_classifier, make_vectorizer, save_version
+
+    if path is None:
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "dataset.csv")
+
+    # Primera pasada solo por la columna de etiquetas: partial_fit necesita todas las clases
+    distribution = collections.Counter()
+    for chunk in pd.read_csv(path, usecols=["label"], chunksize=chunk_size * 10):
+        distribution.update(chunk["label"].dropna().astype(str))
+    classes = sorted(distribution)
+    print("Distribución de clases:", distribution)
+
+    vectorizer = make_vectorizer()
+    clf = make_classifier()
+    t0 = time.perf_counter()
+    n_train = 0
+    for epoch in range(epochs):
+        for messages, labels in iter_labeled_chunks(path, chunk_size):
+            rows = [(m, l) for m, l in zip(messages, labels) if not in_holdout(m, holdout_pct)]
+            if not rows:
+                continue
+            batch, y = zip(*rows)
+            X_text = preprocess_many(batch)
+            clf.partial_fit(vectorizer.transform(X_text), y, classes=classes)
+            if epoch == 0:
+                n_train += len(rows)
+        print(f"Época {epoch + 1}/{epochs}: {n_train} mensajes de entrenamiento, {time.perf_counter() - t0:.1f} s")
+    train_s = time.perf_counter() - t0
+
+    # Evaluación en streaming sobre el holdout
+    confusion = collections.Counter()
+    for messages, labels in iter_labeled_chunks(path, chunk_size):
+        rows = [(m, l) for m, l in zip(messages, labels) if in_holdout(m, holdout_pct)]
+        if rows:
+            batch, y = zip(*rows)
+            confusion.update(zip(y, (str(p) for p in clf.predict(vectorizer.transform(preprocess_many(batch))))))
+    n_holdout = sum(confusion.values())
+    accuracy = sum(n for (real, pred), n in confusion.items() if real == pred) / max(n_holdout, 1)
+    f1 = macro_f1(confusion, classes)
+    peak_mb = _peak_memory_mb()
+    print(f"Holdout: {n_holdout} mensajes, accuracy {accuracy:.4f}, F1 macro {f1:.4f}")
+    if peak_mb is None:
+        print(f"Entrenamiento {train_s:.1f} s")
+    else:
+        print(f"Entrenamiento {train_s:.1f} s, memoria máxima del proceso {peak_mb:.0f} MB")
+
+    meta = {
+        "padre": None,
+        "origen": os.path.basename(path),
+        "muestras": n_train,
+        "muestras_total": n_train,
+        "clases": classes,
+        "streaming": {"chunk_size": chunk_size, "epochs": epochs, "holdout_pct": holdout_pct},
+        "holdout": {
+            "muestras": n_holdout,
+            "accuracy": round(accuracy, 4),
+            "f1_macro": round(f1, 4),
+            "confusion": {f"{real} -> {pred}": n for (real, pred), n in sorted(confusion.items())},
+        },
+        "segundos": round(train_s, 2),
+        "memoria_max_mb": None if peak_mb is None else round(peak_mb),
+    }
+    destino = config.ONLINE_PATH if publish else config.STREAMING_PATH
+    version = save_version(clf, meta, destino)
+    if publish:
+        print("Guardada versión online", version, "en", destino)
+        print("La API en modo auto (SALLEXA_SERVING_FORMAT) usará este modelo en lugar del TF-IDF")
+    else:
+        print("Guardada versión", version, "en", destino, "(no publicada; usa --publish para servirla)")
+    return version
+
+
+def plot_confusion_matrix(df_cm, path):
+    """Dibuja la matriz de confusión (matplotlib/seaborn se importan solo aquí)."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(8,6))
     sns.heatmap(df_cm, annot=True, fmt='d', cmap='Blues')
     plt.xlabel("Predicción")
     plt.ylabel("Verdadero")
     plt.title("Matriz de Confusión")
     plt.tight_layout()
-    plt.savefig(os.path.join(out_dir, "confusion_matrix.png"))
-    print("Guardada imagen de matriz de confusión")
+    plt.savefig(path)
+    plt.close()
+
 
 if __name__ == '__main__':
-    train_and_evaluate()
+    parser = argparse.ArgumentParser(description="Entrenamiento del clasificador Sallexa")
+    parser.add_argument("--select", action="store_true",
+                        help="selección de modelo con validación cruzada en paralelo")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1, help="procesos en paralelo (-1: todos los núcleos)")
+    parser.add_argument("--stream", action="store_true",
+                        help="entrenamiento fuera de memoria por bloques (modelo online)")
+    parser.add_argument("--data", help="CSV con columnas message,label (por defecto dataset.csv)")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--holdout", type=int, default=10, help="porcentaje de mensajes para evaluar")
+    parser.add_argument("--publish", action="store_true",
+                        help="con --stream, guardar en el modelo online que sirve la API")
+    args = parser.parse_args()
+    if args.stream:
+        train_streaming(args.data, chunk_size=args.chunk_size, epochs=args.epochs, holdout_pct=args.holdout,
+                        publish=args.publish)
+    elif args.select:
+        select_model(n_splits=args.folds, n_jobs=args.jobs)
+    else:
+        train_and_evaluate()